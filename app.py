@@ -1,15 +1,28 @@
 import os
 import urllib.parse  # <-- pour encoder les caractères spéciaux dans le mot de passe
 from flask import Flask, render_template, redirect, url_for, request, flash, g, session
-from werkzeug.security import generate_password_hash
 from flask_mail import Message
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from sqlalchemy import func
+import click
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # -------------------------------
 # Import des extensions et modèles
 # -------------------------------
 from extensions import db, migrate, mail
+from evenements import bus_evenements
+from preparation import tableau_preparation
+from capacite import generer_creneaux, lire_horaires
+from liste_attente import files_attente
+from limites import limiteur
+from identite import client_courant, identite_courante
+from mots_de_passe import rehacher_clients, methode_politique, construire_methode, normaliser_methode
+from conseiller_index import analyser, peupler as peupler_volume, SEUIL_LIGNES
 from models import Plat, Categorie, Contact, Reservation, Avis, Client, ReservationItem
 
 # -------------------------------
@@ -45,30 +58,68 @@ def create_app():
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'super-secret-key')
+    # Politique de hachage des mots de passe : algorithme (pbkdf2 / scrypt) et coût ;
+    # HACHAGE_METHODE (chaîne Werkzeug complète) reste prioritaire si elle est fournie
+    app.config['HACHAGE_METHODE'] = os.environ.get('HACHAGE_METHODE') or construire_methode(
+        os.environ.get('HACHAGE_ALGORITHME', 'pbkdf2'),
+        os.environ.get('HACHAGE_COUT')
+    )
     app.config['MAIL_SERVER'] = 'smtp.gmail.com'
     app.config['MAIL_PORT'] = 587
     app.config['MAIL_USE_TLS'] = True
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 
+    # -------------------------------
+    # Capacité des créneaux de réservation
+    # -------------------------------
+    # HORAIRES_OUVERTURE : "11:30-15:00,18:30-22:30" (tous les jours) ou JSON par jour, voir capacite.lire_horaires
+    app.config['HORAIRES_OUVERTURE'] = lire_horaires(os.environ.get('HORAIRES_OUVERTURE'))
+    app.config['DUREE_CRENEAU_MINUTES'] = int(os.environ.get('DUREE_CRENEAU_MINUTES', 30))
+    app.config['COUVERTS_PAR_CRENEAU'] = int(os.environ.get('COUVERTS_PAR_CRENEAU', 40))
+    app.config['TABLES_PAR_CRENEAU'] = int(os.environ.get('TABLES_PAR_CRENEAU', 10))
+
+    # -------------------------------
+    # Limitation des connexions / inscriptions (memoire, base ou redis)
+    # -------------------------------
+    app.config['LIMITE_DEBIT_STOCKAGE'] = os.environ.get('LIMITE_DEBIT_STOCKAGE', 'memoire')
+    app.config['LIMITE_DEBIT_REDIS_URL'] = os.environ.get('LIMITE_DEBIT_REDIS_URL')
+    # Proxys de confiance devant l'application (Heroku / Render : 1). À 0, X-Forwarded-For est ignoré :
+    # le fixer au-delà du nombre réel de proxys permettrait à un client de choisir son IP
+    app.config['PROXY_SAUTS'] = int(os.environ.get('PROXY_SAUTS', 0))
+    # Durée de vie (s) de l'identité du client connecté gardée en session
+    app.config['IDENTITE_TTL'] = int(os.environ.get('IDENTITE_TTL', 60))
+    # Mois de réservations gardés dans les tables actives (flask reservation archiver)
+    app.config['ARCHIVE_MOIS_ACTIFS'] = int(os.environ.get('ARCHIVE_MOIS_ACTIFS', 12))
+
     # -------------------------------
     # Initialisation des extensions
     # -------------------------------
     db.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
+    bus_evenements.init_app(app)
+    tableau_preparation.init_app(app)
+    files_attente.init_app(app)
+    limiteur.init_app(app)
+
+    # request.remote_addr = IP du visiteur et non celle du proxy (clé du limiteur de débit)
+    if app.config['PROXY_SAUTS']:
+        sauts = app.config['PROXY_SAUTS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=sauts, x_proto=sauts, x_host=sauts)
 
     # -------------------------------
     # Gestion de l'utilisateur connecté
     # -------------------------------
+    # Chargement paresseux : une requête qui ne touche pas au client ne fait aucun SELECT
     @app.before_request
     def load_logged_in_client():
-        client_id = session.get('client_id')
-        g.client = Client.query.get(client_id) if client_id else None
+        g.client = LocalProxy(client_courant)
 
     @app.context_processor
     def inject_current_user():
-        return dict(current_user=g.client)
+        # Champs d'identité servis depuis le cache de session (IDENTITE_TTL secondes)
+        return dict(current_user=LocalProxy(identite_courante))
 
     # -------------------------------
     # Filtres Jinja2 personnalisés
@@ -203,19 +254,108 @@ def create_app():
         return render_template('errors/500.html'), 500
 
     # -------------------------------
-    # Commande CLI : hashage des mots de passe
+    # Commande CLI : rehachage des mots de passe (texte en clair, anciens paramètres)
+    # -------------------------------
+    @app.cli.command('rehash-passwords')
+    @click.option('--lot', default=500, help="Clients lus et commités par lot.")
+    @click.option('--processus', default=None, type=int, help="Processus de hachage (défaut : nombre de CPU).")
+    @click.option('--anciens-hashs', is_flag=True,
+                  help="Envelopper aussi les hashs dont les paramètres diffèrent de HACHAGE_METHODE.")
+    def rehacher_mots_de_passe(lot, processus, anciens_hashs):
+        debut = time.monotonic()
+
+        def progression(total, dernier_id):
+            duree = time.monotonic() - debut
+            print(f"  {total} mot(s) de passe rehaché(s) (id <= {dernier_id}), "
+                  f"{total / duree if duree else 0:.1f}/s")
+
+        # spawn : pas de fork d'un processus qui a déjà ouvert des connexions
+        with ProcessPoolExecutor(max_workers=processus or os.cpu_count() or 1,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            total = rehacher_clients(pool, taille_lot=lot, anciens_hashs=anciens_hashs, progression=progression)
+
+        duree = time.monotonic() - debut
+        print(f"{total} mot(s) de passe rehaché(s) en {duree:.1f} s "
+              f"({total / duree if duree else 0:.1f}/s, méthode {methode_politique()}).")
+
+    # -------------------------------
+    # Commande CLI : coût d'une connexion selon la politique de hachage
+    # -------------------------------
+    @app.cli.command('benchmark-login')
+    @click.option('--methode', 'methodes', multiple=True,
+                  help="Méthode Werkzeug à mesurer (répétable). Défaut : politique actuelle et quelques variantes.")
+    @click.option('--essais', default=20, help="Vérifications par méthode.")
+    @click.option('--threads', default=8, help="Threads par worker (gunicorn --threads).")
+    def benchmark_connexion(methodes, essais, threads):
+        from mots_de_passe import verifier
+        from werkzeug.security import generate_password_hash
+
+        methodes = methodes or (
+            methode_politique(), 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000', 'scrypt:32768:8:1'
+        )
+        print(f"{'méthode':<28}{'médiane ms':>12}{'p95 ms':>10}{'séquentiel/s':>14}{f'{threads} threads/s':>14}")
+        for methode in dict.fromkeys(normaliser_methode(m) for m in methodes):
+            valeur = generate_password_hash('benchmark', method=methode)
+
+            # Latence d'une connexion (la vérification du hash domine le coût de la requête)
+            durees = []
+            for _ in range(essais):
+                debut = time.perf_counter()
+                verifier(valeur, 'benchmark')
+                durees.append(time.perf_counter() - debut)
+            durees.sort()
+            mediane = durees[len(durees) // 2]
+            p95 = durees[min(len(durees) - 1, int(len(durees) * 0.95))]
+
+            # Débit d'un worker gthread : hashlib relâche le GIL, les threads se partagent les cœurs
+            with ThreadPoolExecutor(max_workers=threads) as executeur:
+                debut = time.perf_counter()
+                list(executeur.map(lambda _: verifier(valeur, 'benchmark'), range(essais)))
+                debit = essais / (time.perf_counter() - debut)
+
+            print(f"{methode:<28}{mediane * 1000:>12.1f}{p95 * 1000:>10.1f}{1 / mediane:>14.1f}{debit:>14.1f}")
+        print(f"Politique actuelle : {methode_politique()} ({os.cpu_count()} CPU)")
+
+    # -------------------------------
+    # Commande CLI : conseiller d'index (EXPLAIN du catalogue de requêtes)
+    # -------------------------------
+    @app.cli.command('conseiller-index')
+    @click.option('--seuil', default=SEUIL_LIGNES, show_default=True,
+                  help="Taille de table (lignes) à partir de laquelle un parcours séquentiel est signalé.")
+    @click.option('--peupler', default=0, show_default=True,
+                  help="Clients fictifs à générer (x3 réservations, x9 lignes) le temps de l'analyse ; tout est annulé.")
+    def conseiller_index_cli(seuil, peupler):
+        try:
+            if peupler:
+                peupler_volume(peupler)
+            resultats = analyser(seuil)
+        finally:
+            # Données fictives et statistiques générées : rien n'est conservé
+            db.session.rollback()
+
+        alertes = 0
+        for nom, tables in resultats:
+            if tables:
+                alertes += 1
+                details = ', '.join(f"{table} (~{lignes} lignes)" for table, lignes in tables)
+                print(f"[!] {nom} : parcours séquentiel de {details}")
+            else:
+                print(f"[ok] {nom}")
+        print(f"{alertes} requête(s) sur {len(resultats)} à indexer (seuil {seuil} lignes, {db.engine.dialect.name}).")
+        if alertes:
+            raise SystemExit(1)
+
+    # -------------------------------
+    # Commande CLI : ouverture des créneaux de réservation
     # -------------------------------
-    @app.cli.command('hash_temp_passwords')
-    def hasher_mots_de_passe_temporaire():
-        clients_temp = Client.query.filter_by(mot_de_passe="motdepasse_temporaire").all()
-        if not clients_temp:
-            print("Aucun mot de passe temporaire trouvé.")
-            return
-        for client in clients_temp:
-            client.mot_de_passe = generate_password_hash("motdepasse_temporaire")
-            print(f"Mot de passe hashé pour : {client.email}")
+    @app.cli.command('generer_creneaux')
+    @click.option('--jours', default=30, help="Nombre de jours à ouvrir à partir d'aujourd'hui.")
+    def generer_creneaux_cli(jours):
+        total = 0
+        for i in range(jours):
+            total += generer_creneaux(date.today() + timedelta(days=i))
         db.session.commit()
-        print("Tous les mots de passe temporaires ont été hashés.")
+        print(f"{total} créneau(x) créé(s) sur {jours} jour(s).")
 
     return app
 
@@ -0,0 +1,96 @@
+# archives.py
+# Réservations anciennes déplacées, avec leurs lignes, dans reservations_archive
+# et reservation_items_archive : les tables actives restent petites et toutes
+# les requêtes de l'application n'y lisent que les mois récents. Les rapports
+# peuvent inclure l'archive (?archive=1) via des entités aliasées sur
+# UNION ALL (table active + archive), utilisables comme les classes du modèle.
+from datetime import date
+
+from flask import current_app, request
+from sqlalchemy import delete, func, select, union_all, update
+from sqlalchemy.orm import aliased
+
+from models import (
+    db, ListeAttente, Reservation, ReservationItem, reservations_archive, reservation_items_archive
+)
+
+MOIS_ACTIFS = 12
+TAILLE_LOT = 1000
+
+
+# -------------------------------
+# Lecture : tables actives seules ou actives + archive
+# -------------------------------
+def archive_demandee():
+    return request.args.get('archive', type=int) == 1
+
+
+def entites(archive=False):
+    # (Reservation, ReservationItem) à utiliser dans une même requête : les deux viennent du même appel.
+    # Les objets lus depuis l'archive sont en lecture seule (aucune ligne active à mettre à jour).
+    if not archive:
+        return Reservation, ReservationItem
+    reservations = union_all(select(Reservation.__table__), select(reservations_archive))
+    lignes = union_all(select(ReservationItem.__table__), select(reservation_items_archive))
+    return (
+        aliased(Reservation, reservations.subquery('reservations_et_archive')),
+        aliased(ReservationItem, lignes.subquery('reservation_items_et_archive'))
+    )
+
+
+# -------------------------------
+# Archivage : déplacement par lots, une transaction par lot
+# -------------------------------
+def seuil_archivage(mois=None, aujourd_hui=None):
+    # Premier jour du mois, `mois` mois avant le mois courant : on archive des mois entiers
+    mois = current_app.config.get('ARCHIVE_MOIS_ACTIFS', MOIS_ACTIFS) if mois is None else mois
+    aujourd_hui = aujourd_hui or date.today()
+    rang = aujourd_hui.year * 12 + aujourd_hui.month - 1 - mois
+    return date(rang // 12, rang % 12 + 1, 1)
+
+
+def a_archiver(avant):
+    return db.session.query(func.count(Reservation.id_reservation)).filter(
+        Reservation.date_reservation < avant
+    ).scalar()
+
+
+def archiver(avant, taille_lot=TAILLE_LOT):
+    # Retourne (réservations, lignes) déplacées ; en cas d'erreur seul le lot en cours est annulé
+    reservations = Reservation.__table__
+    lignes = ReservationItem.__table__
+    total_reservations = total_lignes = 0
+
+    while True:
+        ids = db.session.scalars(
+            select(reservations.c.id_reservation)
+            .where(reservations.c.date_reservation < avant)
+            .order_by(reservations.c.id_reservation)
+            .limit(taille_lot)
+        ).all()
+        if not ids:
+            return total_reservations, total_lignes
+
+        try:
+            db.session.execute(reservations_archive.insert().from_select(
+                [c.name for c in reservations.columns],
+                select(reservations).where(reservations.c.id_reservation.in_(ids))
+            ))
+            copiees = db.session.execute(reservation_items_archive.insert().from_select(
+                [c.name for c in lignes.columns],
+                select(lignes).where(lignes.c.id_reservation.in_(ids))
+            )).rowcount
+            # Explicite : SQLite n'applique pas les ON DELETE sans PRAGMA foreign_keys
+            db.session.execute(
+                update(ListeAttente).where(ListeAttente.id_reservation.in_(ids))
+                .values(id_reservation=None).execution_options(synchronize_session=False)
+            )
+            db.session.execute(delete(lignes).where(lignes.c.id_reservation.in_(ids)))
+            db.session.execute(delete(reservations).where(reservations.c.id_reservation.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        total_reservations += len(ids)
+        total_lignes += copiees
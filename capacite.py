@@ -0,0 +1,256 @@
+# capacite.py
+# Capacité des créneaux de service (couverts / tables) pour les réservations de table.
+# Chaque réservation décrémente son créneau par un UPDATE gardé : pas de surréservation.
+import json
+import threading
+import time as horloge
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update, event
+
+from models import db, Creneau
+
+# Horaires par défaut : {jour de la semaine (0 = lundi): [(ouverture, fermeture), ...]}
+HORAIRES_PAR_DEFAUT = {jour: [('11:30', '15:00'), ('18:30', '22:30')] for jour in range(7)}
+
+
+def lire_horaires(valeur):
+    # Variable HORAIRES_OUVERTURE : absente -> horaires par défaut ;
+    # "11:30-15:00,18:30-22:30" -> mêmes plages tous les jours ;
+    # JSON {"0": [["11:30", "15:00"]], "6": []} -> par jour (0 = lundi, jour absent = fermé).
+    # Lève ValueError si le format est invalide (erreur de déploiement, pas de repli silencieux)
+    valeur = (valeur or '').strip()
+    if not valeur:
+        return HORAIRES_PAR_DEFAUT
+    if valeur.startswith('{'):
+        brut = {int(jour): [tuple(plage) for plage in plages] for jour, plages in json.loads(valeur).items()}
+    else:
+        plages = [tuple(plage.strip().split('-')) for plage in valeur.split(',') if plage.strip()]
+        brut = {jour: plages for jour in range(7)}
+    for plages in brut.values():
+        for plage in plages:
+            ouverture, fermeture = (datetime.strptime(h, '%H:%M') for h in plage)
+            if ouverture >= fermeture:
+                raise ValueError(f"Plage horaire invalide : {'-'.join(plage)}")
+    return brut
+
+
+# -------------------------------
+# Créneaux d'une journée d'après les horaires configurés
+# -------------------------------
+def heures_creneaux(jour):
+    horaires = current_app.config.get('HORAIRES_OUVERTURE', HORAIRES_PAR_DEFAUT)
+    duree = timedelta(minutes=current_app.config.get('DUREE_CRENEAU_MINUTES', 30))
+    heures = []
+    for ouverture, fermeture in horaires.get(jour.weekday(), []):
+        debut = datetime.combine(jour, datetime.strptime(ouverture, '%H:%M').time())
+        fin = datetime.combine(jour, datetime.strptime(fermeture, '%H:%M').time())
+        while debut + duree <= fin:
+            heures.append(debut.time())
+            debut += duree
+    return heures
+
+
+def heure_creneau(jour, heure):
+    # Une réservation à 12h10 tombe dans le créneau de 12h00
+    candidates = [h for h in heures_creneaux(jour) if h <= heure]
+    if not candidates:
+        return None
+    duree = timedelta(minutes=current_app.config.get('DUREE_CRENEAU_MINUTES', 30))
+    debut = candidates[-1]
+    if datetime.combine(jour, heure) >= datetime.combine(jour, debut) + duree:
+        return None
+    return debut
+
+
+def generer_creneaux(jour):
+    # INSERT ... ON CONFLICT DO NOTHING : sûr en concurrence et idempotent
+    heures = heures_creneaux(jour)
+    if not heures:
+        return 0
+    couverts = current_app.config.get('COUVERTS_PAR_CRENEAU', 40)
+    tables = current_app.config.get('TABLES_PAR_CRENEAU', 10)
+    lignes = [{
+        'date_creneau': jour,
+        'heure_debut': heure,
+        'couverts_max': couverts,
+        'couverts_restants': couverts,
+        'tables_max': tables,
+        'tables_restantes': tables
+    } for heure in heures]
+
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(Creneau).values(lignes).on_conflict_do_nothing(
+        index_elements=['date_creneau', 'heure_debut']
+    )
+    return db.session.execute(stmt).rowcount
+
+
+# -------------------------------
+# Réserver / libérer (dans la transaction de l'appelant)
+# -------------------------------
+def reserver_creneau(jour, heure, personnes, hors_horaires=False):
+    # Retourne (id_creneau, None) ou (None, message d'erreur).
+    # hors_horaires=True (saisie admin) : une heure hors service est acceptée sans créneau.
+    if personnes < 1:
+        return None, "Le nombre de personnes doit être au moins 1."
+    debut = heure_creneau(jour, heure)
+    if debut is None:
+        if hors_horaires:
+            return None, None
+        return None, "Le restaurant est fermé à cette heure."
+
+    stmt = (
+        update(Creneau)
+        .where(
+            Creneau.date_creneau == jour,
+            Creneau.heure_debut == debut,
+            Creneau.couverts_restants >= personnes,
+            Creneau.tables_restantes >= 1
+        )
+        .values(
+            couverts_restants=Creneau.couverts_restants - personnes,
+            tables_restantes=Creneau.tables_restantes - 1
+        )
+        .returning(Creneau.id_creneau)
+        .execution_options(synchronize_session=False)
+    )
+    id_creneau = db.session.execute(stmt).scalar()
+    if id_creneau is None and generer_creneaux(jour):
+        # Journée pas encore ouverte à la réservation : on crée ses créneaux et on réessaie
+        id_creneau = db.session.execute(stmt).scalar()
+    if id_creneau is None:
+        return None, "Désolé, aucune table disponible à cette heure."
+    _jours_modifies().add(jour)
+    return id_creneau, None
+
+
+def reserver_creneau_par_id(id_creneau, personnes):
+    # Même UPDATE gardé, quand le créneau est déjà connu (promotion de liste d'attente)
+    jour = db.session.execute(
+        update(Creneau)
+        .where(
+            Creneau.id_creneau == id_creneau,
+            Creneau.couverts_restants >= personnes,
+            Creneau.tables_restantes >= 1
+        )
+        .values(
+            couverts_restants=Creneau.couverts_restants - personnes,
+            tables_restantes=Creneau.tables_restantes - 1
+        )
+        .returning(Creneau.date_creneau)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if jour is None:
+        return False
+    _jours_modifies().add(jour)
+    return True
+
+
+def creneau_de(jour, heure):
+    debut = heure_creneau(jour, heure)
+    if debut is None:
+        return None
+    return Creneau.query.filter_by(date_creneau=jour, heure_debut=debut).first()
+
+
+def liberer_creneau(id_creneau, personnes):
+    if not id_creneau:
+        return
+    jour = db.session.execute(
+        update(Creneau)
+        .where(Creneau.id_creneau == id_creneau)
+        .values(
+            couverts_restants=Creneau.couverts_restants + personnes,
+            tables_restantes=Creneau.tables_restantes + 1
+        )
+        .returning(Creneau.date_creneau)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if jour:
+        _jours_modifies().add(jour)
+
+
+# -------------------------------
+# Disponibilités : cache par jour, invalidé au commit d'une réservation
+# -------------------------------
+_cache_disponibilites = {}
+_verrou_cache = threading.Lock()
+# Dates consultables : d'aujourd'hui à aujourd'hui + HORIZON_DISPONIBILITES jours
+HORIZON_DISPONIBILITES = 60
+
+
+def fenetre_disponibilites():
+    debut = date.today()
+    return debut, debut + timedelta(days=HORIZON_DISPONIBILITES)
+
+
+def _jours_modifies():
+    return db.session.info.setdefault('creneaux_modifies', set())
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalider_apres_commit(session):
+    jours = session.info.pop('creneaux_modifies', None)
+    if jours:
+        with _verrou_cache:
+            for jour in jours:
+                _cache_disponibilites.pop(jour, None)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _oublier_apres_rollback(session):
+    session.info.pop('creneaux_modifies', None)
+
+
+def disponibilites(debut, nb_jours):
+    ttl = current_app.config.get('DISPONIBILITES_TTL', 30)
+    maintenant = horloge.monotonic()
+    jours = [debut + timedelta(days=i) for i in range(nb_jours)]
+
+    resultat = {}
+    with _verrou_cache:
+        for jour in jours:
+            entree = _cache_disponibilites.get(jour)
+            if entree and maintenant - entree[0] <= ttl:
+                resultat[jour] = entree[1]
+
+    manquants = [jour for jour in jours if jour not in resultat]
+    if manquants:
+        # Une seule requête pour tous les jours absents du cache
+        lignes = (
+            Creneau.query
+            .filter(Creneau.date_creneau.between(manquants[0], manquants[-1]))
+            .order_by(Creneau.date_creneau, Creneau.heure_debut)
+            .all()
+        )
+        en_base = {}
+        for creneau in lignes:
+            en_base.setdefault(creneau.date_creneau, {})[creneau.heure_debut] = creneau
+
+        couverts = current_app.config.get('COUVERTS_PAR_CRENEAU', 40)
+        tables = current_app.config.get('TABLES_PAR_CRENEAU', 10)
+        for jour in manquants:
+            creneaux_jour = en_base.get(jour, {})
+            # Un créneau pas encore généré est entièrement libre
+            resultat[jour] = [{
+                'heure': heure.strftime('%H:%M'),
+                'couverts_restants': creneaux_jour[heure].couverts_restants if heure in creneaux_jour else couverts,
+                'tables_restantes': creneaux_jour[heure].tables_restantes if heure in creneaux_jour else tables
+            } for heure in heures_creneaux(jour)]
+
+        premier, dernier = fenetre_disponibilites()
+        with _verrou_cache:
+            # Entrées périmées ou hors fenêtre retirées à chaque écriture : le cache reste borné
+            for jour, (charge_le, _) in list(_cache_disponibilites.items()):
+                if maintenant - charge_le > ttl or not premier <= jour <= dernier:
+                    del _cache_disponibilites[jour]
+            for jour in manquants:
+                if premier <= jour <= dernier:
+                    _cache_disponibilites[jour] = (maintenant, resultat[jour])
+
+    return [{'date': jour.isoformat(), 'creneaux': resultat[jour]} for jour in jours]
@@ -0,0 +1,66 @@
+# chargements.py
+# Profils de chargement nommés : options ORM (joinedload / selectinload /
+# contains_eager) à appliquer aux requêtes des vues qui parcourent les
+# relations dans leurs templates, pour éviter une requête par ligne affichée.
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from models import Avis, Plat, Reservation, ReservationItem
+
+
+# Profils des lignes de commande : fonctions des entités (classes du modèle ou
+# alias sur l'archive, voir archives.entites) pour suivre la jointure faite
+def _ligne_detail(R, I):
+    # Lignes dont la requête joint reservation et plat ; client chargé en jointure
+    return (
+        contains_eager(I.reservation.of_type(R)).joinedload(R.client),
+        contains_eager(I.plat),
+    )
+
+
+def _ligne_historique(R, I):
+    # Historique d'un client : le client est connu, inutile de le recharger
+    return (
+        contains_eager(I.reservation.of_type(R)),
+        contains_eager(I.plat),
+    )
+
+
+PROFILS_LIGNES = {
+    'ligne.detail': _ligne_detail,
+    'ligne.historique': _ligne_historique,
+}
+
+PROFILS = {
+    # Commandes d'un client : lignes et plats (mes_commandes, commandes)
+    'reservation.lignes': (
+        selectinload(Reservation.items).joinedload(ReservationItem.plat),
+    ),
+    # Tableau de bord : client + lignes + plats des dernières réservations
+    'reservation.tableau': (
+        joinedload(Reservation.client),
+        selectinload(Reservation.items).joinedload(ReservationItem.plat),
+    ),
+    # Lignes de commande dont la requête joint reservation, client et plat (recherche)
+    'ligne.recherche': (
+        contains_eager(ReservationItem.reservation).contains_eager(Reservation.client),
+        contains_eager(ReservationItem.plat),
+    ),
+    'ligne.detail': _ligne_detail(Reservation, ReservationItem),
+    'ligne.historique': _ligne_historique(Reservation, ReservationItem),
+    # Menu : catégorie, avis et auteur de chaque avis
+    'plat.menu': (
+        joinedload(Plat.categorie),
+        selectinload(Plat.avis).joinedload(Avis.client),
+    ),
+    # Liste admin des plats : catégorie seulement
+    'plat.liste': (
+        joinedload(Plat.categorie),
+    ),
+}
+
+
+def charger(query, profil, entites=None):
+    # Un nom de profil inconnu lève KeyError : erreur de programmation, pas de repli silencieux
+    if entites is not None:
+        return query.options(*PROFILS_LIGNES[profil](*entites))
+    return query.options(*PROFILS[profil])
@@ -0,0 +1,176 @@
+# conseiller_index.py
+# Conseiller d'index : EXPLAIN sur un catalogue des requêtes réellement
+# émises par l'application et signalement des parcours séquentiels de
+# tables au-delà d'un seuil de lignes. Les données de volume éventuelles
+# sont générées dans une transaction annulée : la base n'est pas modifiée.
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, insert, select, text
+
+from archives import entites
+from filtres import requete_historique, requete_items
+from models import (
+    db, Avis, Categorie, Client, ListeAttente, Plat, Reservation, ReservationItem, StatutReservation
+)
+
+SEUIL_LIGNES = 1000
+
+
+# -------------------------------
+# Catalogue : (nom, requête) avec des valeurs représentatives, jamais exécutées
+# -------------------------------
+def catalogue():
+    aujourd_hui = date.today()
+    archive = R, I = entites(archive=True)
+    return [
+        ("scanner : réservation par QR code",
+         Reservation.query.filter_by(qrcode_data='RESERVATION-1')),
+        ("mot de passe oublié : client par jeton",
+         Client.query.filter_by(reset_token='jeton')),
+        ("connexion : client par email",
+         Client.query.filter_by(email='client@exemple.com')),
+        ("menu : plats d'une catégorie",
+         Plat.query.filter_by(categorie_id=1)),
+        ("menu : avis des plats affichés",
+         Avis.query.filter(Avis.id_plat.in_([1, 2, 3]))),
+        ("commandes : réservations d'un client",
+         Reservation.query.filter_by(id_client=1).order_by(Reservation.date_reservation.desc())),
+        ("commandes : lignes des réservations affichées",
+         ReservationItem.query.filter(ReservationItem.id_reservation.in_([1, 2, 3]))),
+        ("historique d'un client (première page)",
+         requete_historique(1).order_by(Reservation.date_reservation.desc(), ReservationItem.id_item.desc()).limit(20)),
+        ("historique d'un client, archives incluses",
+         requete_historique(1, archive).order_by(R.date_reservation.desc(), I.id_item.desc()).limit(20)),
+        ("plats réservés : recherche",
+         requete_items('dupont').order_by(Reservation.date_reservation.desc()).limit(10)),
+        ("suppression d'un plat : lignes du plat",
+         ReservationItem.query.filter_by(plat_id=1)),
+        ("tableau de bord : derniers clients",
+         Client.query.order_by(Client.date_creation.desc()).limit(5)),
+        ("tableau de bord : réservations servies",
+         db.session.query(func.count(Reservation.id_reservation)).filter(Reservation.status == StatutReservation.SERVI)),
+        ("clients servis : période",
+         db.session.query(Reservation.id_client, func.count(Reservation.id_reservation))
+         .filter(Reservation.status == StatutReservation.SERVI,
+                 Reservation.date_reservation.between(aujourd_hui - timedelta(days=30), aujourd_hui))
+         .group_by(Reservation.id_client)),
+        ("préparation : réservations actives du jour",
+         db.session.query(Reservation.id_reservation, ReservationItem.plat_id, ReservationItem.quantite)
+         .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+         .filter(Reservation.date_reservation == aujourd_hui,
+                 Reservation.active)),
+        ("liste d'attente : inscrits d'un créneau",
+         ListeAttente.query.filter_by(id_creneau=1, statut='En attente')),
+    ]
+
+
+# -------------------------------
+# Lecture des plans
+# -------------------------------
+def _compiler(query):
+    instruction = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True})
+    if instruction.positiontup is not None:
+        return instruction.string, tuple(instruction.params[nom] for nom in instruction.positiontup)
+    return instruction.string, instruction.params
+
+
+def _parcours_postgresql(query):
+    sql, params = _compiler(query)
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    parcours = []
+    a_visiter = [plan[0]['Plan']]
+    while a_visiter:
+        noeud = a_visiter.pop()
+        if noeud.get('Node Type') == 'Seq Scan':
+            parcours.append(noeud['Relation Name'])
+        a_visiter.extend(noeud.get('Plans', []))
+    return parcours
+
+
+def _parcours_sqlite(query):
+    sql, params = _compiler(query)
+    lignes = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+    # « SCAN table » seul = lecture complète ; « SCAN table USING INDEX » parcourt un index
+    return [detail.split()[1] for *_, detail in lignes
+            if detail.startswith('SCAN ') and 'INDEX' not in detail]
+
+
+def _taille(table):
+    if db.engine.dialect.name == 'postgresql':
+        estimation = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {'table': table}
+        ).scalar()
+        if estimation is not None and estimation >= 0:
+            return int(estimation)
+    if table not in db.metadata.tables:
+        return 0
+    return db.session.execute(select(func.count()).select_from(db.metadata.tables[table])).scalar()
+
+
+def analyser(seuil=SEUIL_LIGNES):
+    # [(nom de la requête, [(table, lignes)] parcourues séquentiellement au-delà du seuil)]
+    parcours = _parcours_postgresql if db.engine.dialect.name == 'postgresql' else _parcours_sqlite
+    resultats = []
+    for nom, query in catalogue():
+        tables = [(table, _taille(table)) for table in dict.fromkeys(parcours(query))]
+        resultats.append((nom, [(table, lignes) for table, lignes in tables if lignes >= seuil]))
+    return resultats
+
+
+# -------------------------------
+# Données de volume (dans la transaction courante, annulée par l'appelant)
+# -------------------------------
+def peupler(nb_clients, graine=42):
+    alea = random.Random(graine)
+    aujourd_hui = date.today()
+
+    db.session.execute(insert(Categorie), [{'nom': f"Conseil {i}"} for i in range(10)])
+    categories = db.session.scalars(select(Categorie.categorie_id).where(Categorie.nom.like('Conseil %'))).all()
+    db.session.execute(insert(Plat), [
+        {'nom': f"Plat conseil {i}", 'prix': alea.randint(3, 30), 'categorie_id': alea.choice(categories)}
+        for i in range(100)
+    ])
+    plats = db.session.scalars(select(Plat.id_plat).where(Plat.nom.like('Plat conseil %'))).all()
+
+    db.session.execute(insert(Client), [
+        {'nom': f"Client {i}", 'email': f"conseil-{i}@exemple.invalid", 'mot_de_passe': '!',
+         # Quelques réinitialisations en cours, comme en production
+         'reset_token': f"jeton-{i}" if i % 50 == 0 else None,
+         'date_creation': datetime.now() - timedelta(days=alea.randint(0, 730))}
+        for i in range(nb_clients)
+    ])
+    clients = db.session.scalars(select(Client.id_client).where(Client.email.like('conseil-%'))).all()
+
+    db.session.execute(insert(Reservation), [
+        {
+            'id_client': alea.choice(clients),
+            'date_reservation': aujourd_hui - timedelta(days=alea.randint(0, 730)),
+            'heure_reservation': time(alea.randint(11, 22), alea.choice((0, 15, 30, 45))),
+            'status': alea.choice(('En attente', 'Confirmée', 'Servi', 'Servi', 'Servi', 'Annulée')),
+            'qrcode_data': f"CONSEIL-{i}",
+        }
+        for i in range(nb_clients * 3)
+    ])
+    reservations = db.session.scalars(
+        select(Reservation.id_reservation).where(Reservation.qrcode_data.like('CONSEIL-%'))
+    ).all()
+
+    db.session.execute(insert(ReservationItem), [
+        {'id_reservation': id_reservation, 'plat_id': alea.choice(plats),
+         'quantite': alea.randint(1, 4), 'prix_unitaire': alea.randint(3, 30)}
+        for id_reservation in reservations for _ in range(3)
+    ])
+    db.session.execute(insert(Avis), [
+        {'id_plat': alea.choice(plats), 'id_client': alea.choice(clients), 'note': alea.randint(1, 5)}
+        for _ in range(nb_clients)
+    ])
+
+    # Statistiques à jour pour le planificateur (annulées avec la transaction)
+    for table in ('categorie', 'plats', 'clients', 'reservations', 'reservation_items', 'avis'):
+        db.session.execute(text(f"ANALYZE {table}"))
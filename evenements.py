@@ -0,0 +1,162 @@
+# evenements.py
+# Bus d'événements temps réel (commandes créées, servies, statut modifié)
+# consommé par le flux SSE de reservation_public.
+import json
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import text
+
+CANAL_PG = 'plat_evenements'
+# Événements potentiellement perdus (abonné trop lent, écoute PostgreSQL coupée) : tout relire
+RESYNC = json.dumps({'type': 'resync', 'data': {}})
+DELAI_RECONNEXION = 5
+
+
+class BusEvenements:
+    def __init__(self):
+        self._abonnes = set()
+        self._ecouteurs = []
+        self._verrou = threading.Lock()
+        self._app = None
+        self._ecoute_pg = None
+
+    # -------------------------------
+    # Initialisation (comme les extensions Flask)
+    # -------------------------------
+    def init_app(self, app):
+        self._app = app
+        # Multi-workers : on passe par PostgreSQL LISTEN/NOTIFY, sinon diffusion en mémoire
+        app.config.setdefault(
+            'EVENEMENTS_PG_NOTIFY',
+            app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres')
+        )
+        app.extensions['evenements'] = self
+
+    @property
+    def pg_notify(self):
+        return bool(self._app and self._app.config.get('EVENEMENTS_PG_NOTIFY'))
+
+    # -------------------------------
+    # Abonnement (un abonné = une connexion SSE)
+    # -------------------------------
+    def abonner(self):
+        file_attente = queue.Queue(maxsize=100)
+        with self._verrou:
+            self._abonnes.add(file_attente)
+        self.assurer_ecoute()
+        return file_attente
+
+    def desabonner(self, file_attente):
+        with self._verrou:
+            self._abonnes.discard(file_attente)
+
+    # -------------------------------
+    # Écouteurs internes (caches en mémoire mis à jour par les événements)
+    # -------------------------------
+    def ecouter(self, callback):
+        # callback(type_evenement, donnees) ; appelé sans contexte applicatif
+        self._ecouteurs.append(callback)
+
+    def assurer_ecoute(self):
+        # À appeler au premier usage d'un cache : pas de thread pour les commandes CLI
+        if self.pg_notify:
+            self._demarrer_ecoute_pg()
+
+    # -------------------------------
+    # Publication (à appeler après le commit)
+    # -------------------------------
+    def publier(self, type_evenement, donnees):
+        message = json.dumps({'type': type_evenement, 'data': donnees}, default=str)
+        if self.pg_notify:
+            try:
+                from extensions import db
+                with db.engine.connect() as conn:
+                    conn.execute(text("SELECT pg_notify(:canal, :message)"),
+                                 {'canal': CANAL_PG, 'message': message})
+                    conn.commit()
+                return
+            except Exception as e:
+                self._app.logger.error(f"NOTIFY impossible, diffusion locale : {e}")
+        self._diffuser(message)
+
+    def _diffuser(self, message):
+        if self._ecouteurs:
+            evenement = json.loads(message)
+            for callback in self._ecouteurs:
+                try:
+                    callback(evenement['type'], evenement['data'])
+                except Exception as e:
+                    if self._app:
+                        self._app.logger.error(f"Écouteur d'événements en erreur : {e}")
+
+        with self._verrou:
+            abonnes = list(self._abonnes)
+        for file_attente in abonnes:
+            try:
+                file_attente.put_nowait(message)
+            except queue.Full:
+                # Client trop lent : on l'abandonne plutôt que de bloquer les autres,
+                # en vidant sa file pour lui laisser un dernier "resync" qui ferme son flux
+                self.desabonner(file_attente)
+                self._vider(file_attente)
+                file_attente.put_nowait(RESYNC)
+
+    @staticmethod
+    def _vider(file_attente):
+        try:
+            while True:
+                file_attente.get_nowait()
+        except queue.Empty:
+            pass
+
+    # -------------------------------
+    # Écoute PostgreSQL (un thread par worker)
+    # -------------------------------
+    def _demarrer_ecoute_pg(self):
+        with self._verrou:
+            if self._ecoute_pg and self._ecoute_pg.is_alive():
+                return
+            self._ecoute_pg = threading.Thread(target=self._ecouter_pg, daemon=True)
+            self._ecoute_pg.start()
+
+    def _ecouter_pg(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        with self._app.app_context():
+            from extensions import db
+            dsn = db.engine.url.render_as_string(hide_password=False)
+        dsn = dsn.replace('postgresql+psycopg2://', 'postgresql://')
+
+        # Reconnexion après chaque erreur ; les NOTIFY émis pendant la coupure sont perdus,
+        # d'où le "resync" diffusé une fois l'écoute rétablie
+        coupure = False
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL_PG};")
+                if coupure:
+                    self._diffuser(RESYNC)
+                    coupure = False
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._diffuser(conn.notifies.pop(0).payload)
+            except Exception as e:
+                self._app.logger.error(f"Écoute LISTEN/NOTIFY interrompue, reprise dans {DELAI_RECONNEXION} s : {e}")
+                coupure = True
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(DELAI_RECONNEXION)
+
+
+bus_evenements = BusEvenements()
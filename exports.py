@@ -0,0 +1,229 @@
+# exports.py
+# Exports comptables (réservations, lignes de commande) lus par curseur serveur
+# (yield_per) et écrits au fil de l'eau : la mémoire du worker reste bornée
+# quelle que soit la taille de l'export.
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+
+from flask import Response, request, send_file, stream_with_context, abort
+
+from archives import archive_demandee, entites as entites_archive
+from filtres import filtre_recherche, filtrer, RECHERCHE_CLIENT, RECHERCHE_ITEMS
+from models import db, Client, Plat, Reservation, ReservationItem
+
+TAILLE_LOT = 1000
+
+
+# Colonnes exportées, relatives aux entités de la requête (tables actives ou archive incluse)
+def colonnes_reservations(R=Reservation):
+    return [
+        ('id_reservation', R.id_reservation),
+        ('date', R.date_reservation),
+        ('heure', R.heure_reservation),
+        ('status', R.status),
+        ('nombre_personnes', R.nombre_personnes),
+        ('servi_le', R.servi_le),
+        ('id_client', Client.id_client),
+        ('client', Client.nom),
+        ('email', Client.email),
+        ('telephone', Client.telephone),
+    ]
+
+
+def colonnes_items(R=Reservation, I=ReservationItem):
+    return [
+        ('id_item', I.id_item),
+        ('id_reservation', R.id_reservation),
+        ('date', R.date_reservation),
+        ('heure', R.heure_reservation),
+        ('status', R.status),
+        ('id_client', Client.id_client),
+        ('client', Client.nom),
+        ('email', Client.email),
+        ('telephone', Client.telephone),
+        ('plat_id', I.plat_id),
+        ('plat', Plat.nom),
+        ('quantite', I.quantite),
+        ('prix_unitaire', I.prix_unitaire),
+        ('total', I.quantite * I.prix_unitaire),
+    ]
+
+
+COLONNES_RESERVATIONS = colonnes_reservations()
+COLONNES_ITEMS = colonnes_items()
+
+
+# -------------------------------
+# Filtres communs (recherche + période)
+# -------------------------------
+def _periode(date_debut=None, date_fin=None, R=Reservation):
+    # Lève ValueError si une date n'est pas au format AAAA-MM-JJ
+    conditions = []
+    if date_debut:
+        conditions.append(R.date_reservation >= datetime.strptime(date_debut, "%Y-%m-%d").date())
+    if date_fin:
+        conditions.append(R.date_reservation <= datetime.strptime(date_fin, "%Y-%m-%d").date())
+    return conditions
+
+
+def requete_export_reservations(search='', date_debut=None, date_fin=None, archive=False):
+    R, _ = entites_archive(archive)
+    query = (
+        db.session.query(*[colonne for _, colonne in colonnes_reservations(R)])
+        .select_from(R)
+        .outerjoin(Client, Client.id_client == R.id_client)
+    )
+    query = filtrer(query, filtre_recherche(search, RECHERCHE_CLIENT), *_periode(date_debut, date_fin, R))
+    return query.order_by(R.id_reservation)
+
+
+def requete_export_items(search='', date_debut=None, date_fin=None, archive=False):
+    R, I = entites_archive(archive)
+    query = (
+        db.session.query(*[colonne for _, colonne in colonnes_items(R, I)])
+        .select_from(I)
+        .join(R, R.id_reservation == I.id_reservation)
+        .outerjoin(Client, Client.id_client == R.id_client)
+        .outerjoin(Plat, Plat.id_plat == I.plat_id)
+    )
+    query = filtrer(query, filtre_recherche(search, RECHERCHE_ITEMS), *_periode(date_debut, date_fin, R))
+    return query.order_by(I.id_item)
+
+
+def lignes(query, colonnes):
+    # En-tête puis tuples bruts : pas d'objets ORM, curseur côté serveur sur PostgreSQL
+    yield [nom for nom, _ in colonnes]
+    for ligne in query.yield_per(TAILLE_LOT):
+        yield ligne
+
+
+# -------------------------------
+# Injection de formules : un texte saisi par un client (nom, message...) commençant
+# par = + - @ serait exécuté par Excel / LibreOffice ; préfixé de ' il reste du texte
+# -------------------------------
+CARACTERES_FORMULE = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _neutraliser(texte):
+    return f"'{texte}" if texte.startswith(CARACTERES_FORMULE) else texte
+
+
+# -------------------------------
+# CSV : un morceau de réponse par lot de lignes
+# -------------------------------
+def _cellule(valeur):
+    if valeur is None:
+        return ''
+    if hasattr(valeur, 'isoformat'):
+        return valeur.isoformat()
+    if isinstance(valeur, str):
+        return _neutraliser(valeur)
+    return valeur
+
+
+def flux_csv(source):
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon)
+    for i, ligne in enumerate(source, 1):
+        ecrivain.writerow([_cellule(v) for v in ligne])
+        if i % TAILLE_LOT == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue()
+
+
+# -------------------------------
+# XLSX : xlsxwriter en mode constant_memory (chaque ligne part sur disque dès la suivante)
+# -------------------------------
+def ecrire_xlsx(source, chemin, feuille='Export'):
+    import xlsxwriter
+
+    classeur = xlsxwriter.Workbook(chemin, {
+        'constant_memory': True,
+        'tmpdir': tempfile.gettempdir(),
+        'strings_to_formulas': False
+    })
+    onglet = classeur.add_worksheet(feuille)
+    for i, ligne in enumerate(source):
+        onglet.write_row(i, 0, [_xlsx(v) for v in ligne])
+    classeur.close()
+
+
+def _xlsx(valeur):
+    if valeur is None:
+        return None
+    if hasattr(valeur, 'isoformat'):
+        return valeur.isoformat()
+    if isinstance(valeur, str):
+        return _neutraliser(valeur)
+    if not isinstance(valeur, (int, float)):
+        return float(valeur)
+    return valeur
+
+
+def fichier_xlsx(source, feuille='Export'):
+    # Retourne le chemin d'un fichier temporaire ; à supprimer par l'appelant
+    descripteur, chemin = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descripteur)
+    try:
+        ecrire_xlsx(source, chemin, feuille)
+    except Exception:
+        os.remove(chemin)
+        raise
+    return chemin
+
+
+# -------------------------------
+# Réponse HTTP commune aux blueprints (?format=csv|xlsx, filtres en query string)
+# -------------------------------
+def reponse_export(fabrique_requete, colonnes, nom):
+    format_export = request.args.get('format', 'csv')
+    if format_export not in ('csv', 'xlsx'):
+        abort(400, description="Format d'export inconnu (csv ou xlsx).")
+    try:
+        query = fabrique_requete(
+            request.args.get('search', ''),
+            request.args.get('date_debut') or None,
+            request.args.get('date_fin') or None,
+            archive_demandee()
+        )
+    except ValueError:
+        abort(400, description="Format de date invalide (AAAA-MM-JJ).")
+
+    horodatage = datetime.now().strftime('%Y%m%d_%H%M')
+    if format_export == 'csv':
+        return Response(
+            stream_with_context(flux_csv(lignes(query, colonnes))),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={nom}_{horodatage}.csv'}
+        )
+
+    try:
+        chemin = fichier_xlsx(lignes(query, colonnes), feuille=nom)
+    except ImportError:
+        abort(501, description="Export XLSX indisponible : xlsxwriter n'est pas installé.")
+    # Fichier ouvert puis retiré du disque : il disparaît à la fermeture de la réponse
+    fichier = open(chemin, 'rb')
+    os.remove(chemin)
+    return send_file(
+        fichier,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f"{nom}_{horodatage}.xlsx"
+    )
+
+
+def exporter_vers_fichier(fabrique_requete, colonnes, chemin, search='', date_debut=None, date_fin=None, archive=False):
+    # Utilisé par les commandes CLI ; le format suit l'extension du fichier
+    source = lignes(fabrique_requete(search, date_debut, date_fin, archive), colonnes)
+    if chemin.endswith('.xlsx'):
+        ecrire_xlsx(source, chemin)
+        return
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        for morceau in flux_csv(source):
+            fichier.write(morceau)
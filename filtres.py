@@ -0,0 +1,65 @@
+# filtres.py
+# Filtres de recherche partagés par les listes admin et requêtes de lignes
+# de commande (liste, historique d'un client).
+from sqlalchemy import or_, func
+
+from chargements import charger
+from models import db, Client, Plat, Reservation, ReservationItem
+from revenus import montant
+
+# Colonnes interrogées par la barre de recherche des listes de plats réservés
+RECHERCHE_CLIENT = (Client.nom, Client.email, Client.telephone)
+RECHERCHE_ITEMS = RECHERCHE_CLIENT + (Plat.nom,)
+
+
+def filtre_recherche(search, colonnes):
+    # Retourne la condition OR des ilike, ou None si la recherche est vide
+    search = (search or '').strip()
+    if not search:
+        return None
+    return or_(*[colonne.ilike(f"%{search}%") for colonne in colonnes])
+
+
+def filtrer(query, *conditions):
+    conditions = [c for c in conditions if c is not None]
+    return query.filter(*conditions) if conditions else query
+
+
+# -------------------------------
+# Lignes de commande : requête de page
+# -------------------------------
+def requete_items(search=''):
+    # Jointures explicites réutilisées par le profil 'ligne.recherche' : pas de requête par ligne affichée
+    query = (
+        ReservationItem.query
+        .join(ReservationItem.reservation)
+        .join(Reservation.client)
+        .join(ReservationItem.plat)
+    )
+    return filtrer(charger(query, 'ligne.recherche'), filtre_recherche(search, RECHERCHE_ITEMS))
+
+
+
+# -------------------------------
+# Historique d'un client : lignes chargées avec leur réservation et leur plat
+# -------------------------------
+# entites : (Reservation, ReservationItem) ou alias sur l'archive (archives.entites)
+def requete_historique(client_id, entites=None):
+    R, I = entites or (Reservation, ReservationItem)
+    query = (
+        db.session.query(I)
+        .join(I.reservation.of_type(R))
+        .join(I.plat)
+        .filter(R.id_client == client_id)
+    )
+    return charger(query, 'ligne.historique', entites)
+
+
+def totaux_historique(client_id, entites=None):
+    # Montant au prix payé (prix_unitaire), pas au prix actuel du plat
+    R, I = entites or (Reservation, ReservationItem)
+    total_general, lignes = db.session.query(
+        montant(I),
+        func.count(I.id_item)
+    ).join(I.reservation.of_type(R)).filter(R.id_client == client_id).one()
+    return {'total_general': float(total_general), 'lignes': int(lignes)}
@@ -0,0 +1,55 @@
+# identite.py
+# Client connecté chargé à la demande : g.client n'interroge la base qu'au
+# premier accès, et les champs d'identité affichés par les templates sont
+# gardés quelques secondes dans la session (cookie signé).
+import time as horloge
+
+from flask import g, session, current_app
+
+from models import db, Client
+
+CHAMPS_IDENTITE = ('id_client', 'nom', 'prenom', 'email', 'telephone')
+
+
+class Identite:
+    # Sous-ensemble en lecture seule d'un Client, suffisant pour l'en-tête et les formulaires
+    def __init__(self, champs):
+        for champ in CHAMPS_IDENTITE:
+            setattr(self, champ, champs.get(champ))
+
+    def __repr__(self):
+        return f"<Identite {self.nom} {self.prenom} - {self.email}>"
+
+
+def client_courant():
+    # Objet Client complet, chargé une seule fois par requête
+    if '_client' not in g:
+        client_id = session.get('client_id')
+        g._client = db.session.get(Client, client_id) if client_id else None
+    return g._client
+
+
+def identite_courante():
+    if '_identite' in g:
+        return g._identite
+    client_id = session.get('client_id')
+    identite = None
+    if client_id:
+        cache = session.get('identite')
+        if cache and cache.get('id_client') == client_id and cache.get('expire', 0) > horloge.time():
+            identite = Identite(cache)
+        else:
+            client = client_courant()
+            if client is not None:
+                champs = {champ: getattr(client, champ) for champ in CHAMPS_IDENTITE}
+                session['identite'] = {**champs, 'expire': horloge.time() + current_app.config.get('IDENTITE_TTL', 60)}
+                identite = Identite(champs)
+    g._identite = identite
+    return identite
+
+
+def oublier_identite():
+    # À appeler quand le profil change ou que l'utilisateur connecté change
+    session.pop('identite', None)
+    g.pop('_identite', None)
+    g.pop('_client', None)
@@ -0,0 +1,218 @@
+# import_clients.py
+# Import en masse de clients depuis un CSV lu en flux : validation ligne par
+# ligne, hachage des mots de passe en parallèle (pool de processus) et
+# upsert par lots (INSERT ... ON CONFLICT (email)). Les lignes invalides
+# sont signalées sans interrompre l'import.
+import csv
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import DataError, IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, Client
+from mots_de_passe import methode_politique, SANS_MOT_DE_PASSE
+from telephone import normaliser_telephone
+
+TAILLE_LOT = 1000
+TELEPHONE_MAX = Client.__table__.c.telephone.type.length
+EMAIL_VALIDE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RapportImport:
+    def __init__(self):
+        self.inseres = 0
+        self.mis_a_jour = 0
+        self.erreurs = []  # [(numéro de ligne, email, message)]
+
+    def erreur(self, ligne, email, message):
+        self.erreurs.append((ligne, email, message))
+
+    @property
+    def traites(self):
+        return self.inseres + self.mis_a_jour
+
+
+# -------------------------------
+# Étape 1 : lecture et validation
+# -------------------------------
+def _champ(ligne, *noms):
+    for nom in noms:
+        valeur = ligne.get(nom)
+        if valeur is not None and valeur.strip():
+            return valeur.strip()
+    return None
+
+
+def lignes_valides(flux, rapport):
+    # Génère (numéro de ligne, dict prêt pour l'upsert, mot de passe en clair ou None)
+    lecteur = csv.DictReader(flux)
+    if not lecteur.fieldnames or 'email' not in [c.strip().lower() for c in lecteur.fieldnames]:
+        rapport.erreur(1, None, "En-tête CSV invalide : une colonne « email » est requise.")
+        return
+    lecteur.fieldnames = [c.strip().lower() for c in lecteur.fieldnames]
+
+    for ligne in lecteur:
+        numero = lecteur.line_num
+        email = _champ(ligne, 'email')
+        nom = _champ(ligne, 'nom')
+        telephone = _champ(ligne, 'telephone', 'téléphone')
+
+        if not email or not EMAIL_VALIDE.match(email):
+            rapport.erreur(numero, email, "Email manquant ou invalide.")
+            continue
+        if not nom:
+            rapport.erreur(numero, email, "Nom manquant.")
+            continue
+        telephone_normalise = None
+        if telephone and len(telephone) > TELEPHONE_MAX:
+            # Valeur brute stockée telle quelle : trop longue, la base rejetterait tout le lot
+            rapport.erreur(numero, email, f"Numéro de téléphone trop long ({TELEPHONE_MAX} caractères maximum) : {telephone}")
+            continue
+        if telephone:
+            telephone_normalise = normaliser_telephone(telephone)
+            if not telephone_normalise:
+                rapport.erreur(numero, email, f"Numéro de téléphone invalide : {telephone}")
+                continue
+
+        yield numero, {
+            'nom': nom[:100],
+            'prenom': (_champ(ligne, 'prenom', 'prénom') or '')[:100] or None,
+            'email': email[:100],
+            'telephone': telephone,
+            'telephone_normalise': telephone_normalise,
+        }, _champ(ligne, 'mot_de_passe', 'password')
+
+
+def _lots(source, taille):
+    lot = []
+    for element in source:
+        lot.append(element)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+# -------------------------------
+# Étape 2 : dédoublonnage et conflits de téléphone
+# -------------------------------
+def _filtrer_lot(lot, rapport):
+    # Dans un même fichier, la dernière ligne d'un email l'emporte
+    par_email = {}
+    for numero, valeurs, mot_de_passe in lot:
+        if valeurs['email'] in par_email:
+            rapport.erreur(par_email[valeurs['email']][0], valeurs['email'],
+                           f"Email répété ligne {numero} : cette ligne est ignorée.")
+        par_email[valeurs['email']] = (numero, valeurs, mot_de_passe)
+
+    telephones = {v['telephone_normalise'] for _, v, _ in par_email.values() if v['telephone_normalise']}
+    existants = db.session.query(Client.email, Client.telephone_normalise).filter(
+        or_(Client.email.in_(list(par_email)), Client.telephone_normalise.in_(list(telephones)))
+    ).all()
+    emails_existants = {email for email, _ in existants}
+    proprietaire_telephone = {tel: email for email, tel in existants if tel}
+
+    retenus = []
+    for numero, valeurs, mot_de_passe in par_email.values():
+        tel = valeurs['telephone_normalise']
+        if tel:
+            proprietaire = proprietaire_telephone.get(tel)
+            if proprietaire and proprietaire != valeurs['email']:
+                rapport.erreur(numero, valeurs['email'], f"Téléphone déjà utilisé par {proprietaire}.")
+                continue
+            proprietaire_telephone[tel] = valeurs['email']
+        retenus.append((numero, valeurs, mot_de_passe))
+    return retenus, emails_existants
+
+
+# -------------------------------
+# Étape 3 : upsert par lot
+# -------------------------------
+def _upsert(lignes):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    table = Client.__table__
+    stmt = insert(table).values(lignes)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['email'],
+        set_={
+            'nom': stmt.excluded.nom,
+            'prenom': func.coalesce(stmt.excluded.prenom, table.c.prenom),
+            'telephone': func.coalesce(stmt.excluded.telephone, table.c.telephone),
+            'telephone_normalise': func.coalesce(stmt.excluded.telephone_normalise, table.c.telephone_normalise),
+            # Un client existant garde son mot de passe si le fichier n'en fournit pas
+            'mot_de_passe': case(
+                (stmt.excluded.mot_de_passe == SANS_MOT_DE_PASSE, table.c.mot_de_passe),
+                else_=stmt.excluded.mot_de_passe
+            ),
+        }
+    )
+    db.session.execute(stmt)
+
+
+def _ecrire_lot(retenus, emails_existants, rapport):
+    lignes = [valeurs for _, valeurs, _ in retenus]
+    try:
+        with db.session.begin_nested():
+            _upsert(lignes)
+    except (IntegrityError, DataError):
+        # Conflit ou valeur refusée inattendus (import concurrent...) : on isole la ligne fautive
+        for numero, valeurs, _ in retenus:
+            try:
+                with db.session.begin_nested():
+                    _upsert([valeurs])
+            except (IntegrityError, DataError) as e:
+                rapport.erreur(numero, valeurs['email'], f"Rejet par la base : {e.orig}")
+                continue
+            _compter(rapport, valeurs, emails_existants)
+        return
+    for valeurs in lignes:
+        _compter(rapport, valeurs, emails_existants)
+
+
+def _compter(rapport, valeurs, emails_existants):
+    if valeurs['email'] in emails_existants:
+        rapport.mis_a_jour += 1
+    else:
+        rapport.inseres += 1
+
+
+# -------------------------------
+# Pipeline complet
+# -------------------------------
+def importer_clients(flux, taille_lot=None, processus=None, progression=None):
+    taille_lot = taille_lot or current_app.config.get('IMPORT_TAILLE_LOT', TAILLE_LOT)
+    processus = processus or current_app.config.get('IMPORT_PROCESSUS') or os.cpu_count() or 1
+    rapport = RapportImport()
+    methode = methode_politique()
+
+    # spawn : pas de fork d'un worker gunicorn multi-thread
+    with ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for lot in _lots(lignes_valides(flux, rapport), taille_lot):
+            retenus, emails_existants = _filtrer_lot(lot, rapport)
+            if not retenus:
+                continue
+
+            # Hachage en parallèle des seuls mots de passe fournis
+            a_hacher = [mdp for _, _, mdp in retenus if mdp]
+            hashes = iter(pool.map(generate_password_hash, a_hacher, [methode] * len(a_hacher), chunksize=32))
+            maintenant = datetime.utcnow()
+            for _, valeurs, mot_de_passe in retenus:
+                valeurs['mot_de_passe'] = next(hashes) if mot_de_passe else SANS_MOT_DE_PASSE
+                valeurs['date_creation'] = maintenant
+
+            _ecrire_lot(retenus, emails_existants, rapport)
+            db.session.commit()
+            if progression:
+                progression(rapport)
+
+    return rapport
@@ -0,0 +1,209 @@
+# limites.py
+# Limitation de débit par seau à jetons (clé IP et clé email) pour les routes
+# qui hachent un mot de passe : la requête est refusée (429) avant tout hachage.
+# Stockage : mémoire (un worker), base de données ou Redis (partagés).
+import math
+import threading
+import time as horloge
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, flash, render_template, make_response, current_app
+from sqlalchemy import case, literal
+
+# {nom de règle: (capacité, jetons rechargés par seconde)}
+REGLES_PAR_DEFAUT = {
+    'connexion_ip': (20, 20 / 60),
+    'connexion_email': (5, 5 / 300),
+    'inscription_ip': (5, 5 / 600),
+    # Un même email visé depuis plusieurs IP (le décorateur limiter lit f"{action}_email")
+    'inscription_email': (3, 3 / 3600),
+}
+
+
+# -------------------------------
+# Stockages : prendre(cle, capacite, debit) -> (accepté, secondes avant le prochain jeton)
+# -------------------------------
+class StockageMemoire:
+    # Seaux par ordre d'utilisation (LRU) : {cle: (jetons, maj, capacite, debit)}
+    # La règle est gardée dans le seau : chaque seau est jugé avec sa propre capacité / son débit
+    EXAMINES = 8
+
+    def __init__(self, taille_max=100000):
+        self._seaux = OrderedDict()
+        self._verrou = threading.Lock()
+        self.taille_max = taille_max
+
+    def prendre(self, cle, capacite, debit):
+        maintenant = horloge.monotonic()
+        with self._verrou:
+            jetons, maj, _, _ = self._seaux.get(cle, (capacite, maintenant, capacite, debit))
+            jetons = min(capacite, jetons + (maintenant - maj) * debit)
+            accepte = jetons >= 1
+            if accepte:
+                jetons -= 1
+            if cle in self._seaux:
+                self._seaux.move_to_end(cle)
+            elif len(self._seaux) >= self.taille_max:
+                self._evincer(maintenant)
+            self._seaux[cle] = (jetons, maintenant, capacite, debit)
+        return accepte, _attente(jetons, debit)
+
+    def _evincer(self, maintenant):
+        # Coût borné même sous attaque : parmi les EXAMINES plus anciens, un seau déjà plein
+        # (l'oublier ne change rien), sinon le moins récemment utilisé
+        for i, (cle, (jetons, maj, capacite, debit)) in enumerate(self._seaux.items()):
+            if i >= self.EXAMINES:
+                break
+            if jetons + (maintenant - maj) * debit >= capacite:
+                del self._seaux[cle]
+                return
+        self._seaux.popitem(last=False)
+
+
+class StockageBase:
+    # Un seul INSERT ... ON CONFLICT DO UPDATE ... RETURNING par prise : atomique entre workers
+    def __init__(self, purge_toutes=1000):
+        self._appels = 0
+        self.purge_toutes = purge_toutes
+
+    def prendre(self, cle, capacite, debit):
+        from extensions import db
+        from models import LimiteDebit
+
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        maintenant = horloge.time()
+        table = LimiteDebit.__table__
+        recharge = table.c.jetons + (literal(maintenant) - table.c.maj) * debit
+        disponibles = case((recharge > capacite, literal(float(capacite))), else_=recharge)
+        stmt = insert(table).values(cle=cle, jetons=float(capacite) - 1, maj=maintenant, accepte=True)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['cle'],
+            set_={
+                'jetons': case((disponibles >= 1, disponibles - 1), else_=disponibles),
+                'maj': maintenant,
+                'accepte': disponibles >= 1,
+            }
+        ).returning(table.c.jetons, table.c.accepte)
+
+        # Connexion séparée : la limite est enregistrée même si la requête échoue ensuite
+        with db.engine.begin() as conn:
+            jetons, accepte = conn.execute(stmt).one()
+            self._appels += 1
+            if self._appels % self.purge_toutes == 0:
+                # Seaux inactifs depuis une heure : forcément pleins, inutile de les garder
+                conn.execute(table.delete().where(table.c.maj < maintenant - 3600))
+        return bool(accepte), _attente(jetons, debit)
+
+
+class StockageRedis:
+    SCRIPT = """
+local donnees = redis.call('HMGET', KEYS[1], 'jetons', 'maj')
+local capacite = tonumber(ARGV[1])
+local debit = tonumber(ARGV[2])
+local maintenant = tonumber(ARGV[3])
+local jetons = tonumber(donnees[1]) or capacite
+local maj = tonumber(donnees[2]) or maintenant
+jetons = math.min(capacite, jetons + (maintenant - maj) * debit)
+local accepte = 0
+if jetons >= 1 then
+    jetons = jetons - 1
+    accepte = 1
+end
+redis.call('HSET', KEYS[1], 'jetons', jetons, 'maj', maintenant)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacite / debit) + 1)
+return {accepte, tostring(jetons)}
+"""
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def prendre(self, cle, capacite, debit):
+        accepte, jetons = self._script(keys=[f"limite:{cle}"], args=[capacite, debit, horloge.time()])
+        return bool(accepte), _attente(float(jetons), debit)
+
+
+def _attente(jetons, debit):
+    if jetons >= 1:
+        return 0
+    return max(1, math.ceil((1 - jetons) / debit))
+
+
+# -------------------------------
+# Limiteur (initialisé comme une extension Flask)
+# -------------------------------
+class LimiteurDebit:
+    def __init__(self):
+        self.stockage = None
+        self.regles = dict(REGLES_PAR_DEFAUT)
+        self.rejets = {}
+        self._verrou = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('LIMITES_DEBIT', {})
+        app.config.setdefault('LIMITE_DEBIT_STOCKAGE', 'memoire')
+        app.config.setdefault('LIMITE_DEBIT_REDIS_URL', None)
+        self.regles = {**REGLES_PAR_DEFAUT, **app.config['LIMITES_DEBIT']}
+
+        stockage = app.config['LIMITE_DEBIT_STOCKAGE']
+        if stockage == 'redis':
+            self.stockage = StockageRedis(app.config['LIMITE_DEBIT_REDIS_URL'])
+        elif stockage == 'base':
+            self.stockage = StockageBase()
+        else:
+            self.stockage = StockageMemoire()
+        app.extensions['limites'] = self
+
+    def verifier(self, regle, valeur):
+        # Retourne 0 si la requête passe, sinon le délai Retry-After en secondes
+        if not valeur or regle not in self.regles:
+            return 0
+        capacite, debit = self.regles[regle]
+        try:
+            accepte, attente = self.stockage.prendre(f"{regle}:{valeur}", capacite, debit)
+        except Exception as e:
+            # Stockage partagé indisponible : on ne bloque pas les connexions légitimes
+            current_app.logger.error(f"Limiteur de débit indisponible : {e}")
+            return 0
+        if accepte:
+            return 0
+        with self._verrou:
+            self.rejets[regle] = self.rejets.get(regle, 0) + 1
+        return attente
+
+    def compteurs(self):
+        with self._verrou:
+            return dict(self.rejets)
+
+
+limiteur = LimiteurDebit()
+
+
+# -------------------------------
+# Décorateur : appliqué aux POST avant toute vérification / hachage de mot de passe
+# -------------------------------
+def limiter(action, template):
+    def decorateur(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                # L'IP d'abord : un email ciblé ne consomme pas de jeton si l'IP est déjà bloquée
+                attente = limiteur.verifier(f"{action}_ip", request.remote_addr)
+                if not attente:
+                    email = (request.form.get('email') or '').strip().lower()
+                    attente = limiteur.verifier(f"{action}_email", email)
+                if attente:
+                    flash(f"Trop de tentatives. Réessayez dans {attente} seconde(s).", "danger")
+                    reponse = make_response(render_template(template), 429)
+                    reponse.headers['Retry-After'] = str(attente)
+                    return reponse
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorateur
@@ -0,0 +1,225 @@
+# liste_attente.py
+# Liste d'attente par créneau : une file en mémoire par créneau, triée par
+# ordre d'inscription, persistée dans la table liste_attente.
+import bisect
+import threading
+import time as horloge
+from datetime import datetime
+
+from flask import url_for
+from flask_mail import Message
+from sqlalchemy import update, event
+
+from capacite import reserver_creneau_par_id
+from models import db, Creneau, ListeAttente, Reservation, StatutReservation
+from telephone import normaliser_telephone
+
+
+class FilesAttente:
+    def __init__(self, ttl=300):
+        # {id_creneau: (charge_le, [(date_inscription, id_attente, personnes), ...])}, listes triées
+        self._files = {}
+        self._verrou = threading.Lock()
+        self.ttl = ttl
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('LISTE_ATTENTE_TTL', 300)
+
+        @event.listens_for(db.session, 'after_rollback')
+        def _oublier_files_modifiees(session):
+            # Les lignes reviennent à leur état d'avant : on relira la file depuis la base
+            creneaux = session.info.pop('files_attente_modifiees', None)
+            if creneaux:
+                with self._verrou:
+                    for id_creneau in creneaux:
+                        self._files.pop(id_creneau, None)
+
+        @event.listens_for(db.session, 'after_commit')
+        def _valider_files_modifiees(session):
+            session.info.pop('files_attente_modifiees', None)
+
+    def _marquer(self, id_creneau):
+        db.session.info.setdefault('files_attente_modifiees', set()).add(id_creneau)
+
+    def _file(self, id_creneau):
+        with self._verrou:
+            entree = self._files.get(id_creneau)
+        if entree and horloge.monotonic() - entree[0] <= self.ttl:
+            return entree[1]
+
+        lignes = (
+            db.session.query(ListeAttente.date_inscription, ListeAttente.id_attente, ListeAttente.nombre_personnes)
+            .filter(ListeAttente.id_creneau == id_creneau, ListeAttente.statut == 'En attente')
+            .all()
+        )
+        file_priorite = sorted(tuple(ligne) for ligne in lignes)
+        maintenant = horloge.monotonic()
+        with self._verrou:
+            # Files périmées (créneaux passés ou plus consultés) retirées à chaque chargement
+            for ancien in [c for c, (charge_le, _) in self._files.items() if maintenant - charge_le > self.ttl]:
+                del self._files[ancien]
+            self._files[id_creneau] = (maintenant, file_priorite)
+        return file_priorite
+
+    def _expirer(self, id_creneau):
+        # Créneau passé : ses demandes encore en attente ne seront jamais promues
+        db.session.execute(
+            update(ListeAttente)
+            .where(ListeAttente.id_creneau == id_creneau, ListeAttente.statut == 'En attente')
+            .values(statut='Expirée')
+            .execution_options(synchronize_session=False)
+        )
+        with self._verrou:
+            self._files.pop(id_creneau, None)
+        self._marquer(id_creneau)
+
+    # -------------------------------
+    # Inscription (dans la transaction de l'appelant)
+    # -------------------------------
+    def inscrire(self, id_creneau, nom, prenom, email, telephone, personnes):
+        # Retourne la demande créée, la demande déjà en attente du même contact, ou None (créneau passé)
+        creneau = db.session.get(Creneau, id_creneau)
+        if creneau is None or datetime.combine(creneau.date_creneau, creneau.heure_debut) <= datetime.now():
+            return None
+
+        email_normalise = (email or '').strip().lower()
+        telephone_normalise = normaliser_telephone(telephone)
+        en_attente = ListeAttente.query.filter_by(id_creneau=id_creneau, statut='En attente').all()
+        for existante in en_attente:
+            if (email_normalise and (existante.email or '').strip().lower() == email_normalise) or \
+                    (telephone_normalise and normaliser_telephone(existante.telephone) == telephone_normalise):
+                return existante
+
+        attente = ListeAttente(
+            id_creneau=id_creneau,
+            nom=nom,
+            prenom=prenom,
+            email=email,
+            telephone=telephone,
+            nombre_personnes=personnes,
+            date_inscription=datetime.now()
+        )
+        db.session.add(attente)
+        db.session.flush()
+
+        file_priorite = self._file(id_creneau)
+        entree = (attente.date_inscription, attente.id_attente, personnes)
+        with self._verrou:
+            if entree not in file_priorite:
+                bisect.insort(file_priorite, entree)
+        self._marquer(id_creneau)
+        return attente
+
+    # -------------------------------
+    # Promotion après libération de capacité (même transaction)
+    # -------------------------------
+    def promouvoir(self, id_creneau):
+        file_priorite = self._file(id_creneau)
+        if not file_priorite:
+            return []
+
+        creneau = (
+            Creneau.query
+            .filter_by(id_creneau=id_creneau)
+            .populate_existing()
+            .first()
+        )
+        if not creneau:
+            return []
+        if datetime.combine(creneau.date_creneau, creneau.heure_debut) <= datetime.now():
+            self._expirer(id_creneau)
+            return []
+        couverts, tables = creneau.couverts_restants, creneau.tables_restantes
+
+        promus = []
+        traites = set()
+        # Premier arrivé servi, mais un grand groupe qui ne rentre pas ne bloque pas les petits :
+        # parcours complet de la file, déjà triée par ordre d'inscription
+        with self._verrou:
+            candidats = list(file_priorite)
+        for date_inscription, id_attente, personnes in candidats:
+            if tables < 1:
+                break
+            if personnes > couverts:
+                continue
+
+            # Réclamation gardée : un autre worker a pu promouvoir cette demande
+            reclame = db.session.execute(
+                update(ListeAttente)
+                .where(ListeAttente.id_attente == id_attente, ListeAttente.statut == 'En attente')
+                .values(statut='Promue')
+                .returning(ListeAttente.id_attente)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            traites.add(id_attente)
+            if reclame is None:
+                continue
+            if not reserver_creneau_par_id(id_creneau, personnes):
+                db.session.execute(
+                    update(ListeAttente)
+                    .where(ListeAttente.id_attente == id_attente)
+                    .values(statut='En attente')
+                    .execution_options(synchronize_session=False)
+                )
+                traites.discard(id_attente)
+                break
+
+            attente = db.session.get(ListeAttente, id_attente, populate_existing=True)
+            reservation = Reservation(
+                nom_client=attente.nom,
+                prenom_client=attente.prenom,
+                email_client=attente.email,
+                telephone=attente.telephone,
+                date_reservation=creneau.date_creneau,
+                heure_reservation=creneau.heure_debut,
+                nombre_personnes=personnes,
+                status=StatutReservation.EN_ATTENTE,
+                qrcode_data=f"{attente.telephone}_{datetime.now().timestamp()}",
+                id_creneau=id_creneau
+            )
+            db.session.add(reservation)
+            db.session.flush()
+            attente.id_reservation = reservation.id_reservation
+            promus.append((attente, reservation))
+
+            couverts -= personnes
+            tables -= 1
+
+        if traites:
+            with self._verrou:
+                # Le filtrage conserve l'ordre : la file reste triée
+                file_priorite[:] = [entree for entree in file_priorite if entree[1] not in traites]
+            self._marquer(id_creneau)
+        return promus
+
+
+files_attente = FilesAttente()
+
+
+# -------------------------------
+# Emails de promotion (construits dans la requête, envoyés après le commit)
+# -------------------------------
+def messages_promotion(promus):
+    messages = []
+    for attente, reservation in promus:
+        if not attente.email:
+            continue
+        msg = Message(
+            subject=f"🎉 Une table s'est libérée - Réservation {reservation.id_reservation}",
+            recipients=[attente.email]
+        )
+        msg.body = f"""
+Bonjour {attente.nom},
+
+Bonne nouvelle : une place s'est libérée et votre demande en liste d'attente a été confirmée.
+
+📅 Date : {reservation.date_reservation}
+🕓 Heure : {reservation.heure_reservation.strftime('%H:%M')}
+👥 Nombre de personnes : {reservation.nombre_personnes}
+
+Votre ticket : {url_for('reservation_public.ticket_view', reservation_id=reservation.id_reservation, _external=True)}
+
+À très bientôt !
+"""
+        messages.append(msg)
+    return messages
@@ -0,0 +1,43 @@
+"""Ajout table liste_attente
+
+Revision ID: 21238b7bae6f
+Revises: ddcd684b5634
+Create Date: 2026-10-19 11:47:05.281934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '21238b7bae6f'
+down_revision = 'ddcd684b5634'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('liste_attente',
+        sa.Column('id_attente', sa.Integer(), nullable=False),
+        sa.Column('id_creneau', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=100), nullable=False),
+        sa.Column('prenom', sa.String(length=100), nullable=True),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('telephone', sa.String(length=20), nullable=True),
+        sa.Column('nombre_personnes', sa.Integer(), nullable=False),
+        sa.Column('statut', sa.String(length=20), nullable=False),
+        sa.Column('date_inscription', sa.DateTime(), nullable=False),
+        sa.Column('id_reservation', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['id_creneau'], ['creneaux.id_creneau'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_reservation'], ['reservations.id_reservation'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id_attente')
+    )
+    with op.batch_alter_table('liste_attente', schema=None) as batch_op:
+        batch_op.create_index('ix_liste_attente_creneau_statut', ['id_creneau', 'statut'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('liste_attente', schema=None) as batch_op:
+        batch_op.drop_index('ix_liste_attente_creneau_statut')
+
+    op.drop_table('liste_attente')
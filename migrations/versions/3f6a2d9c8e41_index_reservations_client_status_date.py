@@ -0,0 +1,26 @@
+"""Index composite (id_client, status, date_reservation) pour le rapport clients servis
+
+Revision ID: 3f6a2d9c8e41
+Revises: 5c1e9a7d3b20
+Create Date: 2026-10-19 14:48:37.902215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2d9c8e41'
+down_revision = '5c1e9a7d3b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_client_status_date', ['id_client', 'status', 'date_reservation'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_client_status_date')
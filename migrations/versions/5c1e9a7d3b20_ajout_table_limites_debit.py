@@ -0,0 +1,30 @@
+"""Ajout table limites_debit (seaux à jetons partagés)
+
+Revision ID: 5c1e9a7d3b20
+Revises: 8ed5d99f517d
+Create Date: 2026-10-19 14:05:12.418733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e9a7d3b20'
+down_revision = '8ed5d99f517d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('limites_debit',
+        sa.Column('cle', sa.String(length=200), nullable=False),
+        sa.Column('jetons', sa.Float(), nullable=False),
+        sa.Column('maj', sa.Float(), nullable=False),
+        sa.Column('accepte', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('cle')
+    )
+
+
+def downgrade():
+    op.drop_table('limites_debit')
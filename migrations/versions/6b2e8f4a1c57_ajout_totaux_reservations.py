@@ -0,0 +1,43 @@
+"""Montant total et nombre de lignes stockés sur les réservations, avec reprise des données
+
+Revision ID: 6b2e8f4a1c57
+Revises: 3f6a2d9c8e41
+Create Date: 2026-10-19 16:05:12.481930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2e8f4a1c57'
+down_revision = '3f6a2d9c8e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('nb_items', sa.Integer(), nullable=False, server_default='0'))
+
+    # Reprise : un seul UPDATE à sous-requêtes corrélées (index sur reservation_items.id_reservation)
+    op.execute("""
+        UPDATE reservations SET
+            total = COALESCE((
+                SELECT SUM(ri.quantite * ri.prix_unitaire)
+                FROM reservation_items ri
+                WHERE ri.id_reservation = reservations.id_reservation
+            ), 0),
+            nb_items = (
+                SELECT COUNT(ri.id_item)
+                FROM reservation_items ri
+                WHERE ri.id_reservation = reservations.id_reservation
+            )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_column('nb_items')
+        batch_op.drop_column('total')
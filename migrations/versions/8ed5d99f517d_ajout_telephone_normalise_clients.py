@@ -0,0 +1,80 @@
+"""Ajout telephone_normalise (E.164) sur clients + index unique
+
+Revision ID: 8ed5d99f517d
+Revises: 21238b7bae6f
+Create Date: 2026-10-19 12:20:33.741062
+
+"""
+import re
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8ed5d99f517d'
+down_revision = '21238b7bae6f'
+branch_labels = None
+depends_on = None
+
+INDICATIF = '243'
+
+
+# Copie figée de telephone.normaliser_telephone : la migration ne doit pas
+# changer de comportement si le module évolue.
+def normaliser(telephone):
+    if not telephone:
+        return None
+    brut = telephone.strip()
+    chiffres = re.sub(r'\D', '', brut)
+    if brut.startswith('+'):
+        pass
+    elif chiffres.startswith('00'):
+        chiffres = chiffres[2:]
+    elif chiffres.startswith('0'):
+        chiffres = INDICATIF + chiffres[1:]
+    elif len(chiffres) <= 9:
+        chiffres = INDICATIF + chiffres
+    if not 6 <= len(chiffres) <= 15:
+        return None
+    return f"+{chiffres}"
+
+
+def upgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('telephone_normalise', sa.String(length=20), nullable=True))
+
+    # Backfill : le plus ancien client garde le numéro, les doublons sont signalés
+    conn = op.get_bind()
+    lignes = conn.execute(sa.text(
+        "SELECT id_client, telephone FROM clients WHERE telephone IS NOT NULL ORDER BY id_client"
+    )).fetchall()
+
+    par_numero = defaultdict(list)
+    for id_client, telephone in lignes:
+        numero = normaliser(telephone)
+        if numero:
+            par_numero[numero].append(id_client)
+
+    mises_a_jour = []
+    for numero, ids in par_numero.items():
+        mises_a_jour.append({'numero': numero, 'id_client': ids[0]})
+        if len(ids) > 1:
+            print(f"⚠️ Doublon téléphone {numero} : client {ids[0]} conservé, "
+                  f"clients {ids[1:]} laissés sans telephone_normalise (à fusionner)")
+
+    for debut in range(0, len(mises_a_jour), 1000):
+        conn.execute(
+            sa.text("UPDATE clients SET telephone_normalise = :numero WHERE id_client = :id_client"),
+            mises_a_jour[debut:debut + 1000]
+        )
+
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_clients_telephone_normalise'), ['telephone_normalise'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_clients_telephone_normalise'))
+        batch_op.drop_column('telephone_normalise')
@@ -0,0 +1,26 @@
+"""Ajout colonne servi_le sur reservations
+
+Revision ID: 93f04f6b4a6f
+Revises: 2b247683a387
+Create Date: 2026-10-19 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '93f04f6b4a6f'
+down_revision = '2b247683a387'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('servi_le', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_column('servi_le')
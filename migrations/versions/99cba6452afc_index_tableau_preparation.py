@@ -0,0 +1,32 @@
+"""Index pour le tableau de préparation cuisine
+
+Revision ID: 99cba6452afc
+Revises: 93f04f6b4a6f
+Create Date: 2026-10-19 10:04:18.530112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '99cba6452afc'
+down_revision = '93f04f6b4a6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_date_heure', ['date_reservation', 'heure_reservation'], unique=False)
+
+    with op.batch_alter_table('reservation_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reservation_items_id_reservation'), ['id_reservation'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservation_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reservation_items_id_reservation'))
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_date_heure')
@@ -0,0 +1,32 @@
+"""Index couvrant (id_reservation, plat_id) INCLUDE (quantite, prix_unitaire) sur reservation_items
+
+Revision ID: 9d4c7b1e2a68
+Revises: 6b2e8f4a1c57
+Create Date: 2026-10-19 16:48:03.117624
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4c7b1e2a68'
+down_revision = '6b2e8f4a1c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # L'index couvrant commence par id_reservation : l'index simple devient redondant
+    with op.batch_alter_table('reservation_items', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_reservation_items_couvrant', ['id_reservation', 'plat_id'], unique=False,
+            postgresql_include=['quantite', 'prix_unitaire']
+        )
+        batch_op.drop_index('ix_reservation_items_id_reservation')
+
+
+def downgrade():
+    with op.batch_alter_table('reservation_items', schema=None) as batch_op:
+        batch_op.create_index('ix_reservation_items_id_reservation', ['id_reservation'], unique=False)
+        batch_op.drop_index('ix_reservation_items_couvrant')
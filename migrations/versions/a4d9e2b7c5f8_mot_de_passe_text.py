@@ -0,0 +1,33 @@
+"""Mot de passe client en TEXT (hashs hérités enveloppés sous scrypt, > 200 caractères)
+
+Revision ID: a4d9e2b7c5f8
+Revises: f2b8c4d6a1e3
+Create Date: 2026-10-20 09:41:37.604219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e2b7c5f8'
+down_revision = 'f2b8c4d6a1e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.alter_column('mot_de_passe',
+               existing_type=sa.String(length=200),
+               type_=sa.Text(),
+               existing_nullable=False)
+
+
+def downgrade():
+    # Échoue si des hashs enveloppés de plus de 200 caractères sont encore présents
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.alter_column('mot_de_passe',
+               existing_type=sa.Text(),
+               type_=sa.String(length=200),
+               existing_nullable=False)
@@ -0,0 +1,40 @@
+"""Index partiel des réservations actives (ni servies ni annulées) à la place des non servies
+
+Revision ID: b1d7e3f9a5c2
+Revises: a4d9e2b7c5f8
+Create Date: 2026-10-20 14:12:08.441937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d7e3f9a5c2'
+down_revision = 'a4d9e2b7c5f8'
+branch_labels = None
+depends_on = None
+
+ACTIVES = "status IN ('En attente', 'Confirmée')"
+NON_SERVIES = "status <> 'Servi'"
+
+
+def upgrade():
+    # Écran cuisine, tableau de préparation et manifeste : les annulées n'y figurent plus
+    op.drop_index('ix_reservations_non_servies_date_heure', table_name='reservations')
+    op.create_index(
+        'ix_reservations_actives_date_heure', 'reservations',
+        ['date_reservation', 'heure_reservation'], unique=False,
+        postgresql_where=sa.text(ACTIVES),
+        sqlite_where=sa.text(ACTIVES)
+    )
+
+
+def downgrade():
+    op.drop_index('ix_reservations_actives_date_heure', table_name='reservations')
+    op.create_index(
+        'ix_reservations_non_servies_date_heure', 'reservations',
+        ['date_reservation', 'heure_reservation'], unique=False,
+        postgresql_where=sa.text(NON_SERVIES),
+        sqlite_where=sa.text(NON_SERVIES)
+    )
@@ -0,0 +1,51 @@
+"""Index manquants : clés étrangères et filtres des requêtes courantes
+
+Revision ID: b7e1f3a9c2d4
+Revises: 9d4c7b1e2a68
+Create Date: 2026-10-19 17:32:40.558210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1f3a9c2d4'
+down_revision = '9d4c7b1e2a68'
+branch_labels = None
+depends_on = None
+
+# Déjà couverts par des migrations précédentes, donc absents d'ici :
+# reservation_items.id_reservation (ix_reservation_items_couvrant),
+# reservations.id_client (ix_reservations_client_status_date),
+# reservations.date_reservation (ix_reservations_date_heure),
+# clients.telephone_normalise (index unique).
+INDEX = [
+    ('reservation_items', 'ix_reservation_items_plat_id', ['plat_id']),
+    ('avis', 'ix_avis_id_plat', ['id_plat']),
+    ('avis', 'ix_avis_id_client', ['id_client']),
+    ('plats', 'ix_plats_categorie_id', ['categorie_id']),
+    ('reservations', 'ix_reservations_qrcode_data', ['qrcode_data']),
+    ('reservations', 'ix_reservations_id_creneau', ['id_creneau']),
+    ('reservations', 'ix_reservations_status_date', ['status', 'date_reservation']),
+    ('clients', 'ix_clients_reset_token', ['reset_token']),
+    ('clients', 'ix_clients_date_creation', ['date_creation']),
+    ('liste_attente', 'ix_liste_attente_id_reservation', ['id_reservation']),
+]
+
+
+def _existants(table):
+    # Bases créées par db.create_all() : les index du modèle y sont déjà
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for table, nom, colonnes in INDEX:
+        if nom not in _existants(table):
+            op.create_index(nom, table, colonnes, unique=False)
+
+
+def downgrade():
+    for table, nom, _ in reversed(INDEX):
+        if nom in _existants(table):
+            op.drop_index(nom, table_name=table)
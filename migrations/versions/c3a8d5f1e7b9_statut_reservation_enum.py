@@ -0,0 +1,96 @@
+"""Statut des réservations en type énuméré et index partiel des réservations non servies
+
+Revision ID: c3a8d5f1e7b9
+Revises: b7e1f3a9c2d4
+Create Date: 2026-10-19 18:10:27.903115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8d5f1e7b9'
+down_revision = 'b7e1f3a9c2d4'
+branch_labels = None
+depends_on = None
+
+STATUTS = ('En attente', 'Confirmée', 'Servi', 'Annulée')
+statut_reservation = sa.Enum(*STATUTS, name='statut_reservation', create_constraint=True)
+
+# Variantes historiques connues (casse, accents, espaces retirés) ; NULL ou vide = jamais traité
+VARIANTES = {
+    '': 'En attente',
+    'en attente': 'En attente',
+    'attente': 'En attente',
+    'confirmé': 'Confirmée',
+    'confirmée': 'Confirmée',
+    'confirme': 'Confirmée',
+    'confirmee': 'Confirmée',
+    'annulé': 'Annulée',
+    'annulée': 'Annulée',
+    'annule': 'Annulée',
+    'annulee': 'Annulée',
+    'servi': 'Servi',
+    'servie': 'Servi',
+}
+
+
+def upgrade():
+    # Reprise des seules variantes connues ; toute autre valeur arrête la migration
+    # plutôt que de rouvrir silencieusement une réservation en "En attente"
+    bind = op.get_bind()
+    valeurs = bind.execute(sa.text(
+        "SELECT DISTINCT status FROM reservations "
+        "WHERE status IS NULL OR status NOT IN ('En attente', 'Confirmée', 'Servi', 'Annulée')"
+    )).scalars().all()
+    inconnues = sorted(v for v in valeurs if v is not None and v.strip().lower() not in VARIANTES)
+    if inconnues:
+        raise RuntimeError(
+            f"Statuts de réservation non reconnus : {inconnues}. "
+            "Corrigez-les (En attente, Confirmée, Servi, Annulée) puis relancez la migration."
+        )
+    for valeur in valeurs:
+        cible = VARIANTES[(valeur or '').strip().lower()]
+        condition = "status IS NULL" if valeur is None else "status = :valeur"
+        bind.execute(sa.text(f"UPDATE reservations SET status = :cible WHERE {condition}"),
+                     {'cible': cible, 'valeur': valeur})
+
+    if bind.dialect.name == 'postgresql':
+        statut_reservation.create(bind, checkfirst=True)
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.alter_column(
+            'status',
+            existing_type=sa.String(length=20),
+            type_=statut_reservation,
+            nullable=False,
+            server_default='En attente',
+            postgresql_using='status::statut_reservation'
+        )
+
+    # File de préparation, écran cuisine et manifeste : uniquement les réservations non servies
+    op.create_index(
+        'ix_reservations_non_servies_date_heure', 'reservations',
+        ['date_reservation', 'heure_reservation'], unique=False,
+        postgresql_where=sa.text("status <> 'Servi'"),
+        sqlite_where=sa.text("status <> 'Servi'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_reservations_non_servies_date_heure', table_name='reservations')
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.alter_column(
+            'status',
+            existing_type=statut_reservation,
+            type_=sa.String(length=20),
+            nullable=True,
+            server_default=None,
+            postgresql_using='status::text'
+        )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        statut_reservation.drop(bind, checkfirst=True)
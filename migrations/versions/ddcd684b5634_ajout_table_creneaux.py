@@ -0,0 +1,44 @@
+"""Ajout table creneaux (capacité par créneau de service)
+
+Revision ID: ddcd684b5634
+Revises: 99cba6452afc
+Create Date: 2026-10-19 11:02:51.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ddcd684b5634'
+down_revision = '99cba6452afc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('creneaux',
+        sa.Column('id_creneau', sa.Integer(), nullable=False),
+        sa.Column('date_creneau', sa.Date(), nullable=False),
+        sa.Column('heure_debut', sa.Time(), nullable=False),
+        sa.Column('couverts_max', sa.Integer(), nullable=False),
+        sa.Column('couverts_restants', sa.Integer(), nullable=False),
+        sa.Column('tables_max', sa.Integer(), nullable=False),
+        sa.Column('tables_restantes', sa.Integer(), nullable=False),
+        sa.CheckConstraint('couverts_restants >= 0', name='check_couverts_restants_positif'),
+        sa.CheckConstraint('tables_restantes >= 0', name='check_tables_restantes_positif'),
+        sa.PrimaryKeyConstraint('id_creneau'),
+        sa.UniqueConstraint('date_creneau', 'heure_debut', name='uq_creneaux_date_heure')
+    )
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('id_creneau', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('reservations_id_creneau_fkey', 'creneaux', ['id_creneau'], ['id_creneau'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_constraint('reservations_id_creneau_fkey', type_='foreignkey')
+        batch_op.drop_column('id_creneau')
+
+    op.drop_table('creneaux')
@@ -0,0 +1,81 @@
+"""Tables d'archive des réservations et de leurs lignes (flask reservation archiver)
+
+Revision ID: e5f1a7c3b9d2
+Revises: c3a8d5f1e7b9
+Create Date: 2026-10-19 19:02:44.317520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1a7c3b9d2'
+down_revision = 'c3a8d5f1e7b9'
+branch_labels = None
+depends_on = None
+
+STATUTS = ('En attente', 'Confirmée', 'Servi', 'Annulée')
+
+
+def _statut():
+    # Type statut_reservation déjà créé par c3a8d5f1e7b9 sur PostgreSQL
+    if op.get_bind().dialect.name == 'postgresql':
+        return postgresql.ENUM(*STATUTS, name='statut_reservation', create_type=False)
+    return sa.Enum(*STATUTS, name='statut_reservation', create_constraint=True)
+
+
+def upgrade():
+    # Mêmes colonnes, dans le même ordre, que les tables actives (UNION ALL) ; ni clés étrangères ni défauts
+    op.create_table(
+        'reservations_archive',
+        sa.Column('id_reservation', sa.Integer(), nullable=False),
+        sa.Column('id_client', sa.Integer(), nullable=True),
+        sa.Column('nom_client', sa.String(length=100), nullable=True),
+        sa.Column('prenom_client', sa.String(length=100), nullable=True),
+        sa.Column('email_client', sa.String(length=100), nullable=True),
+        sa.Column('telephone', sa.String(length=20), nullable=True),
+        sa.Column('date_reservation', sa.Date(), nullable=False),
+        sa.Column('heure_reservation', sa.Time(), nullable=False),
+        sa.Column('nombre_personnes', sa.Integer(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('status', _statut(), nullable=False),
+        sa.Column('qrcode_data', sa.String(length=255), nullable=True),
+        sa.Column('servi_le', sa.DateTime(), nullable=True),
+        sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('nb_items', sa.Integer(), nullable=False),
+        sa.Column('id_creneau', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id_reservation')
+    )
+    op.create_index('ix_reservations_archive_client_date', 'reservations_archive',
+                    ['id_client', 'date_reservation'], unique=False)
+    op.create_index('ix_reservations_archive_status_date', 'reservations_archive',
+                    ['status', 'date_reservation'], unique=False)
+
+    op.create_table(
+        'reservation_items_archive',
+        sa.Column('id_item', sa.Integer(), nullable=False),
+        sa.Column('id_reservation', sa.Integer(), nullable=False),
+        sa.Column('plat_id', sa.Integer(), nullable=False),
+        sa.Column('quantite', sa.Integer(), nullable=False),
+        sa.Column('prix_unitaire', sa.Numeric(precision=7, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('id_item')
+    )
+    op.create_index('ix_reservation_items_archive_reservation', 'reservation_items_archive',
+                    ['id_reservation', 'plat_id'], unique=False)
+
+
+def downgrade():
+    # Les réservations archivées sont d'abord remises dans les tables actives (colonnes nommées :
+    # l'ordre physique des tables actives dépend des migrations passées)
+    inspecteur = sa.inspect(op.get_bind())
+    for table in ('reservations', 'reservation_items'):
+        colonnes = ', '.join(c['name'] for c in inspecteur.get_columns(f'{table}_archive'))
+        op.execute(f"INSERT INTO {table} ({colonnes}) SELECT {colonnes} FROM {table}_archive")
+
+    op.drop_index('ix_reservation_items_archive_reservation', table_name='reservation_items_archive')
+    op.drop_table('reservation_items_archive')
+    op.drop_index('ix_reservations_archive_status_date', table_name='reservations_archive')
+    op.drop_index('ix_reservations_archive_client_date', table_name='reservations_archive')
+    op.drop_table('reservations_archive')
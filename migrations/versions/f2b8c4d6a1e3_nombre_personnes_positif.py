@@ -0,0 +1,35 @@
+"""Nombre de personnes strictement positif (réservations, liste d'attente)
+
+Revision ID: f2b8c4d6a1e3
+Revises: e5f1a7c3b9d2
+Create Date: 2026-10-20 09:14:05.226871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8c4d6a1e3'
+down_revision = 'e5f1a7c3b9d2'
+branch_labels = None
+depends_on = None
+
+CONTRAINTES = [
+    ('reservations', 'check_reservation_personnes_positif'),
+    ('liste_attente', 'check_attente_personnes_positif'),
+]
+
+
+def upgrade():
+    for table, nom in CONTRAINTES:
+        # Valeurs nulles ou négatives saisies avant la validation : ramenées à 1 personne
+        op.execute(f"UPDATE {table} SET nombre_personnes = 1 WHERE nombre_personnes < 1")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_check_constraint(nom, 'nombre_personnes > 0')
+
+
+def downgrade():
+    for table, nom in reversed(CONTRAINTES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(nom, type_='check')
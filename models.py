@@ -1,7 +1,12 @@
 # models.py
+import enum
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property, validates
 from extensions import db  # ⚠️ Assure-toi que extensions.py contient db = SQLAlchemy()
+from telephone import normaliser_telephone
+from mots_de_passe import verifier, hacher, a_mettre_a_niveau
 
 # -------------------------------
 # Table des catégories
@@ -33,10 +38,13 @@ class Client(db.Model):
     prenom = db.Column(db.String(100))
     email = db.Column(db.String(100), nullable=False, unique=True)
     telephone = db.Column(db.String(20))
-    mot_de_passe = db.Column(db.String(200), nullable=False)
-    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    # Forme E.164 tenue à jour automatiquement (voir _normaliser_telephone)
+    telephone_normalise = db.Column(db.String(20), unique=True, index=True)
+    # Text : un hash hérité enveloppé (mots_de_passe.py) dépasse 200 caractères sous scrypt
+    mot_de_passe = db.Column(db.Text, nullable=False)
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
-    reset_token = db.Column(db.String(100), nullable=True)
+    reset_token = db.Column(db.String(100), nullable=True, index=True)
     reset_token_expiration = db.Column(db.DateTime, nullable=True)
 
     reservations = db.relationship(
@@ -46,11 +54,24 @@ class Client(db.Model):
     )
     avis = db.relationship('Avis', back_populates='client', cascade='all, delete-orphan')
 
+    @validates('telephone')
+    def _normaliser_telephone(self, key, telephone):
+        self.telephone_normalise = normaliser_telephone(telephone)
+        return telephone
+
     def set_password(self, password):
-        self.mot_de_passe = generate_password_hash(password)
+        self.mot_de_passe = hacher(password)
 
     def check_password(self, password):
-        return check_password_hash(self.mot_de_passe, password)
+        # Gère aussi les anciens hashs enveloppés par la commande rehash-passwords
+        return verifier(self.mot_de_passe, password)
+
+    def mettre_a_niveau_mot_de_passe(self, password):
+        # À appeler après une vérification réussie ; True si le hash a été remplacé
+        if not a_mettre_a_niveau(self.mot_de_passe):
+            return False
+        self.mot_de_passe = hacher(password)
+        return True
 
     def __repr__(self):
         return f"<Client {self.nom} {self.prenom} - {self.email}>"
@@ -70,7 +91,8 @@ class Plat(db.Model):
     categorie_id = db.Column(
         db.Integer,
         db.ForeignKey('categorie.categorie_id', ondelete='SET NULL'),
-        nullable=True
+        nullable=True,
+        index=True
     )
     categorie = db.relationship('Categorie', back_populates='plats')
 
@@ -85,6 +107,42 @@ class Plat(db.Model):
         return f"<Plat {self.nom} ({float(self.prix)}$)>"
 
 
+# -------------------------------
+# Statut des réservations et transitions autorisées
+# -------------------------------
+class StatutReservation(str, enum.Enum):
+    # Hérite de str : comparaisons, templates et JSON voient la valeur ('Servi'...)
+    EN_ATTENTE = 'En attente'
+    CONFIRMEE = 'Confirmée'
+    SERVI = 'Servi'
+    ANNULEE = 'Annulée'
+
+    def __str__(self):
+        return self.value
+
+
+TRANSITIONS_STATUT = {
+    StatutReservation.EN_ATTENTE: {StatutReservation.CONFIRMEE, StatutReservation.SERVI, StatutReservation.ANNULEE},
+    StatutReservation.CONFIRMEE: {StatutReservation.EN_ATTENTE, StatutReservation.SERVI, StatutReservation.ANNULEE},
+    StatutReservation.ANNULEE: {StatutReservation.EN_ATTENTE, StatutReservation.CONFIRMEE},
+    # Servi est définitif : un ticket scanné ne peut pas resservir
+    StatutReservation.SERVI: set(),
+}
+
+
+# Réservations encore à préparer / servir : ni servies ni annulées
+STATUTS_ACTIFS = (StatutReservation.EN_ATTENTE, StatutReservation.CONFIRMEE)
+
+
+class TransitionInvalide(ValueError):
+    pass
+
+
+def statuts_vers(cible):
+    # Statuts depuis lesquels on peut passer à `cible` (pour les UPDATE conditionnels)
+    return [source for source, cibles in TRANSITIONS_STATUT.items() if cible in cibles]
+
+
 # -------------------------------
 # Table des réservations
 # -------------------------------
@@ -106,8 +164,36 @@ class Reservation(db.Model):
     heure_reservation = db.Column(db.Time, nullable=False)
     nombre_personnes = db.Column(db.Integer, default=1, nullable=False)
     message = db.Column(db.Text)
-    status = db.Column(db.String(20), default='En attente')
-    qrcode_data = db.Column(db.String(255))
+    # Enum natif sur PostgreSQL (4 octets), VARCHAR + CHECK ailleurs
+    status = db.Column(
+        db.Enum(
+            StatutReservation, name='statut_reservation', create_constraint=True,
+            values_callable=lambda statuts: [s.value for s in statuts]
+        ),
+        nullable=False,
+        default=StatutReservation.EN_ATTENTE,
+        server_default=StatutReservation.EN_ATTENTE.value
+    )
+    qrcode_data = db.Column(db.String(255), index=True)
+    servi_le = db.Column(db.DateTime, nullable=True)
+    # Montant et nombre de lignes, tenus à jour après chaque flush des lignes de commande
+    total = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
+    nb_items = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    id_creneau = db.Column(
+        db.Integer,
+        db.ForeignKey('creneaux.id_creneau', ondelete='SET NULL'),
+        nullable=True,
+        index=True
+    )
+
+    __table_args__ = (
+        db.CheckConstraint('nombre_personnes > 0', name='check_reservation_personnes_positif'),
+        db.Index('ix_reservations_date_heure', 'date_reservation', 'heure_reservation'),
+        # Rapport clients servis : GROUP BY client sur les réservations d'un statut et d'une période
+        db.Index('ix_reservations_client_status_date', 'id_client', 'status', 'date_reservation'),
+        # Filtres par statut seul (compteurs, rapport servis tous clients) sur une période
+        db.Index('ix_reservations_status_date', 'status', 'date_reservation'),
+    )
 
     client = db.relationship('Client', back_populates='reservations')
     items = db.relationship(
@@ -116,49 +202,192 @@ class Reservation(db.Model):
         cascade='all, delete-orphan'
     )
 
+    @hybrid_property
+    def active(self):
+        # Même prédicat en Python et en SQL ; c'est aussi la condition de l'index partiel
+        return self.statut in STATUTS_ACTIFS
+
+    @active.expression
+    def active(cls):
+        return cls.status.in_(STATUTS_ACTIFS)
+
     @property
-    def total(self):
-        return float(sum(item.total for item in self.items))
+    def statut(self):
+        # Statut courant, y compris sur un objet pas encore flushé (défaut non appliqué)
+        return StatutReservation(self.status or StatutReservation.EN_ATTENTE)
+
+    def peut_passer_a(self, statut):
+        return StatutReservation(statut) in TRANSITIONS_STATUT[self.statut]
+
+    def changer_statut(self, statut):
+        # Retourne False si le statut ne change pas ; lève TransitionInvalide si le passage est interdit
+        statut = StatutReservation(statut)
+        if statut == self.statut:
+            return False
+        if not self.peut_passer_a(statut):
+            raise TransitionInvalide(f"Passage de « {self.statut} » à « {statut} » impossible.")
+        self.status = statut
+        if statut == StatutReservation.SERVI:
+            self.servi_le = datetime.now()
+        return True
 
     def __repr__(self):
         nom_affiche = self.nom_client or (self.client.nom if self.client else "Inconnu")
         return f"<Reservation {self.id_reservation} - Client {nom_affiche}>"
 
 
+# Index partiel : seules les réservations actives (ni servies ni annulées) y figurent
+db.Index(
+    'ix_reservations_actives_date_heure', Reservation.date_reservation, Reservation.heure_reservation,
+    postgresql_where=Reservation.active, sqlite_where=Reservation.active
+)
+
+
 # -------------------------------
 # Table des détails de réservation
 # -------------------------------
 class ReservationItem(db.Model):
     __tablename__ = 'reservation_items'
     id_item = db.Column(db.Integer, primary_key=True)
-    id_reservation = db.Column(
-        db.Integer,
-        db.ForeignKey('reservations.id_reservation', ondelete='CASCADE'),
-        nullable=False
+    # active_history : l'ancienne réservation reste connue si la ligne est déplacée (totaux stockés)
+    id_reservation = column_property(
+        db.Column(
+            db.Integer,
+            db.ForeignKey('reservations.id_reservation', ondelete='CASCADE'),
+            nullable=False
+        ),
+        active_history=True
     )
     plat_id = db.Column(
         db.Integer,
         db.ForeignKey('plats.id_plat', ondelete='CASCADE'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     quantite = db.Column(db.Integer, default=1, nullable=False)
     prix_unitaire = db.Column(db.Numeric(7, 2), nullable=False)
 
     __table_args__ = (
         db.CheckConstraint('quantite > 0', name='check_quantite_positive'),
+        # Index couvrant des agrégats de chiffre d'affaires (revenus.py) ; remplace l'index simple
+        # sur id_reservation. INCLUDE n'existe que sur PostgreSQL, ailleurs l'index reste (id_reservation, plat_id)
+        db.Index(
+            'ix_reservation_items_couvrant', 'id_reservation', 'plat_id',
+            postgresql_include=['quantite', 'prix_unitaire']
+        ),
     )
 
     reservation = db.relationship('Reservation', back_populates='items')
     plat = db.relationship('Plat', back_populates='reservation_items')
 
-    @property
+    @hybrid_property
     def total(self):
-        return float(self.prix_unitaire) * self.quantite
+        # Instance : prix payé x quantité ; classe : expression SQL (rapports, tris)
+        return self.prix_unitaire * self.quantite
 
     def __repr__(self):
         return f"<ReservationItem Reservation={self.id_reservation}, Plat={self.plat_id}, Quantite={self.quantite}>"
 
 
+# -------------------------------
+# Archives : réservations anciennes et leurs lignes, déplacées hors des tables actives (archives.py)
+# -------------------------------
+def _table_archive(table, nom, *index):
+    # Mêmes colonnes dans le même ordre (UNION ALL avec la table active), sans clés étrangères
+    # ni valeurs par défaut : l'archive est en lecture seule et survit à la suppression d'un plat
+    colonnes = [
+        db.Column(colonne.name, colonne.type, primary_key=colonne.primary_key, nullable=colonne.nullable)
+        for colonne in table.columns
+    ]
+    return db.Table(nom, *colonnes, *index)
+
+
+reservations_archive = _table_archive(
+    Reservation.__table__, 'reservations_archive',
+    db.Index('ix_reservations_archive_client_date', 'id_client', 'date_reservation'),
+    db.Index('ix_reservations_archive_status_date', 'status', 'date_reservation')
+)
+
+reservation_items_archive = _table_archive(
+    ReservationItem.__table__, 'reservation_items_archive',
+    db.Index('ix_reservation_items_archive_reservation', 'id_reservation', 'plat_id')
+)
+
+
+# -------------------------------
+# Table des créneaux de service (capacité)
+# -------------------------------
+class Creneau(db.Model):
+    __tablename__ = 'creneaux'
+    id_creneau = db.Column(db.Integer, primary_key=True)
+    date_creneau = db.Column(db.Date, nullable=False)
+    heure_debut = db.Column(db.Time, nullable=False)
+    couverts_max = db.Column(db.Integer, nullable=False)
+    couverts_restants = db.Column(db.Integer, nullable=False)
+    tables_max = db.Column(db.Integer, nullable=False)
+    tables_restantes = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('date_creneau', 'heure_debut', name='uq_creneaux_date_heure'),
+        db.CheckConstraint('couverts_restants >= 0', name='check_couverts_restants_positif'),
+        db.CheckConstraint('tables_restantes >= 0', name='check_tables_restantes_positif'),
+    )
+
+    def __repr__(self):
+        return f"<Creneau {self.date_creneau} {self.heure_debut} - {self.couverts_restants}/{self.couverts_max} couverts>"
+
+
+# -------------------------------
+# Table de la liste d'attente (par créneau et taille de groupe)
+# -------------------------------
+class ListeAttente(db.Model):
+    __tablename__ = 'liste_attente'
+    id_attente = db.Column(db.Integer, primary_key=True)
+    id_creneau = db.Column(
+        db.Integer,
+        db.ForeignKey('creneaux.id_creneau', ondelete='CASCADE'),
+        nullable=False
+    )
+    nom = db.Column(db.String(100), nullable=False)
+    prenom = db.Column(db.String(100))
+    email = db.Column(db.String(100), nullable=False)
+    telephone = db.Column(db.String(20))
+    nombre_personnes = db.Column(db.Integer, nullable=False)
+    statut = db.Column(db.String(20), nullable=False, default='En attente')
+    date_inscription = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    id_reservation = db.Column(
+        db.Integer,
+        db.ForeignKey('reservations.id_reservation', ondelete='SET NULL'),
+        nullable=True,
+        index=True
+    )
+
+    __table_args__ = (
+        db.CheckConstraint('nombre_personnes > 0', name='check_attente_personnes_positif'),
+        db.Index('ix_liste_attente_creneau_statut', 'id_creneau', 'statut'),
+    )
+
+    creneau = db.relationship('Creneau')
+
+    def __repr__(self):
+        return f"<ListeAttente {self.nom} - Creneau={self.id_creneau}, Personnes={self.nombre_personnes}>"
+
+
+# -------------------------------
+# Seaux à jetons partagés entre workers (limitation connexion / inscription)
+# -------------------------------
+class LimiteDebit(db.Model):
+    __tablename__ = 'limites_debit'
+    cle = db.Column(db.String(200), primary_key=True)
+    jetons = db.Column(db.Float, nullable=False)
+    # Horodatage epoch (secondes) de la dernière recharge
+    maj = db.Column(db.Float, nullable=False)
+    accepte = db.Column(db.Boolean, nullable=False, default=True)
+
+    def __repr__(self):
+        return f"<LimiteDebit {self.cle} - {self.jetons:.2f} jeton(s)>"
+
+
 # -------------------------------
 # Table des contacts
 # -------------------------------
@@ -181,12 +410,14 @@ class Avis(db.Model):
     id_plat = db.Column(
         db.Integer,
         db.ForeignKey('plats.id_plat', ondelete='CASCADE'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     id_client = db.Column(
         db.Integer,
         db.ForeignKey('clients.id_client', ondelete='CASCADE'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     note = db.Column(db.Integer, nullable=False)
     commentaire = db.Column(db.Text)
@@ -197,3 +428,50 @@ class Avis(db.Model):
 
     def __repr__(self):
         return f"<Avis Client={self.id_client}, Plat={self.id_plat}, Note={self.note}>"
+
+
+# -------------------------------
+# Totaux stockés des réservations : recalculés en SQL dans la transaction du flush
+# -------------------------------
+def totaux_calcules():
+    # Sous-requêtes corrélées (montant, nombre de lignes) sur la table reservations
+    items = ReservationItem.__table__
+    reservations = Reservation.__table__
+    lignes = items.c.id_reservation == reservations.c.id_reservation
+    montant = select(func.coalesce(func.sum(items.c.quantite * items.c.prix_unitaire), 0)).where(lignes)
+    nombre = select(func.count(items.c.id_item)).where(lignes)
+    return montant.scalar_subquery(), nombre.scalar_subquery()
+
+
+def recalculer_totaux(connexion, ids=None):
+    montant, nombre = totaux_calcules()
+    reservations = Reservation.__table__
+    stmt = update(reservations).values(total=montant, nb_items=nombre)
+    if ids is not None:
+        stmt = stmt.where(reservations.c.id_reservation.in_(list(ids)))
+    return connexion.execute(stmt).rowcount
+
+
+@event.listens_for(db.session, 'after_flush')
+def _totaux_apres_flush(session, contexte):
+    # new / dirty / deleted reflètent encore l'état d'avant le flush
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ReservationItem):
+            ids.add(obj.id_reservation)
+            # Ligne déplacée d'une réservation à une autre : l'ancienne change aussi
+            ids.update(db.inspect(obj).attrs.id_reservation.history.deleted or ())
+    ids.discard(None)
+    if ids:
+        recalculer_totaux(session.connection(), ids)
+        session.info.setdefault('totaux_modifies', set()).update(ids)
+
+
+@event.listens_for(db.session, 'after_flush_postexec')
+def _expirer_totaux(session, contexte):
+    # Les objets Reservation déjà chargés relisent total / nb_items au prochain accès
+    ids = session.info.pop('totaux_modifies', None)
+    if ids:
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, Reservation) and obj.id_reservation in ids:
+                session.expire(obj, ['total', 'nb_items'])
@@ -0,0 +1,174 @@
+# mots_de_passe.py
+# Politique de hachage des mots de passe clients et mise à niveau des
+# anciens hashs (texte en clair hérité, paramètres Werkzeug trop faibles).
+import hashlib
+import re
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, _hash_internal
+
+METHODE_PAR_DEFAUT = 'pbkdf2:sha256:600000'
+# Coût par défaut de chaque algorithme : itérations PBKDF2, facteur N de scrypt
+COUTS_PAR_DEFAUT = {'pbkdf2': 600000, 'scrypt': 32768}
+# Marqueur des comptes sans mot de passe (clients invités, imports)
+SANS_MOT_DE_PASSE = '!'
+# Hash hérité enveloppé hors ligne : enveloppe$<méthode>$<sel>$<hash Werkzeug du hash hérité>
+PREFIXE_ENVELOPPE = 'enveloppe$'
+# Méthodes actuelles de Werkzeug ; les autres formes method$sel$hash viennent de Werkzeug < 2.3
+# (HMAC d'un algorithme hashlib, ou 'plain')
+METHODES_ACTUELLES = ('pbkdf2', 'scrypt')
+METHODES_HERITEES = frozenset(hashlib.algorithms_guaranteed) | {'plain'}
+HEXADECIMAL = re.compile(r'^[0-9a-f]+$')
+
+
+def normaliser_methode(methode):
+    # 'pbkdf2' -> 'pbkdf2:sha256:600000', 'scrypt' -> 'scrypt:32768:8:1'
+    return _hash_internal(methode, 'sel', '')[1]
+
+
+def construire_methode(algorithme, cout=None):
+    algorithme = (algorithme or 'pbkdf2').lower()
+    if algorithme not in COUTS_PAR_DEFAUT:
+        raise ValueError(f"Algorithme de hachage inconnu : {algorithme} (pbkdf2 ou scrypt)")
+    cout = int(cout or COUTS_PAR_DEFAUT[algorithme])
+    if algorithme == 'scrypt':
+        return f"scrypt:{cout}:8:1"
+    return f"pbkdf2:sha256:{cout}"
+
+
+def methode_politique():
+    return normaliser_methode(current_app.config.get('HACHAGE_METHODE', METHODE_PAR_DEFAUT))
+
+
+def hacher(mot_de_passe, methode=None):
+    return generate_password_hash(mot_de_passe, method=methode or methode_politique())
+
+
+# -------------------------------
+# Nature d'une valeur stockée
+# -------------------------------
+def est_enveloppe(valeur):
+    return bool(valeur) and valeur.startswith(PREFIXE_ENVELOPPE)
+
+
+def est_hache(valeur):
+    # Texte en clair seulement si la valeur ne peut pas être un triplet method$sel$hash Werkzeug
+    if not valeur or valeur == SANS_MOT_DE_PASSE:
+        return False
+    if est_enveloppe(valeur):
+        return True
+    parties = valeur.split('$', 2)
+    if len(parties) != 3 or not parties[2]:
+        return False
+    methode, _, empreinte = parties
+    if methode.split(':')[0] in METHODES_ACTUELLES:
+        return True
+    return methode == 'plain' or (methode in METHODES_HERITEES and bool(HEXADECIMAL.match(empreinte)))
+
+
+def est_herite(valeur):
+    # Hash Werkzeug < 2.3 (HMAC simple ou 'plain') : toujours à envelopper, même sans --anciens-hashs
+    return est_hache(valeur) and not est_enveloppe(valeur) and methode_de(valeur).split(':')[0] not in METHODES_ACTUELLES
+
+
+def methode_de(valeur):
+    if est_enveloppe(valeur):
+        return None
+    return valeur.split('$', 1)[0]
+
+
+def a_mettre_a_niveau(valeur, methode=None):
+    # Vrai pour un texte en clair, un hash enveloppé ou un hash aux paramètres différents de la politique
+    if valeur == SANS_MOT_DE_PASSE:
+        return False
+    if not est_hache(valeur) or est_enveloppe(valeur):
+        return True
+    return methode_de(valeur) != (methode or methode_politique())
+
+
+# -------------------------------
+# Vérification (hashs Werkzeug et hashs enveloppés)
+# -------------------------------
+def verifier(valeur, mot_de_passe):
+    if not valeur or valeur == SANS_MOT_DE_PASSE or mot_de_passe is None:
+        return False
+    if est_enveloppe(valeur):
+        _, ancienne_methode, sel, nouveau = valeur.split('$', 3)
+        ancien = f"{ancienne_methode}${sel}${_hash_internal(ancienne_methode, sel, mot_de_passe)[0]}"
+        return check_password_hash(nouveau, ancien)
+    return check_password_hash(valeur, mot_de_passe)
+
+
+# -------------------------------
+# Travail exécuté dans le pool de processus (fonction de module : picklable)
+# -------------------------------
+def rehacher(valeur, methode):
+    # Texte en clair : on le hache. Hash faible : on l'enveloppe dans un hash conforme,
+    # sans connaître le mot de passe ; il sera remplacé par un hash direct à la connexion.
+    if not est_hache(valeur):
+        return generate_password_hash(valeur, method=methode)
+    if est_enveloppe(valeur):
+        return valeur
+    ancienne_methode, sel, _ = valeur.split('$', 2)
+    return f"{PREFIXE_ENVELOPPE}{ancienne_methode}${sel}${generate_password_hash(valeur, method=methode)}"
+
+
+# -------------------------------
+# Rehachage en masse : lots lus par clé, pool de processus, commit par lot
+# -------------------------------
+def _candidat(valeur, methode, anciens_hashs):
+    if not valeur or valeur == SANS_MOT_DE_PASSE or est_enveloppe(valeur):
+        return False
+    if not est_hache(valeur) or est_herite(valeur):
+        return True
+    return anciens_hashs and methode_de(valeur) != methode
+
+
+def rehacher_clients(pool, taille_lot=500, anciens_hashs=False, progression=None):
+    # Import local : models importe ce module pour Client.check_password
+    from sqlalchemy import bindparam, or_, update
+    from models import db, Client
+
+    methode = methode_politique()
+    table = Client.__table__
+    # Garde sur l'ancienne valeur : un mot de passe changé entre-temps n'est pas écrasé
+    stmt = (
+        update(table)
+        .where(table.c.id_client == bindparam('b_id'), table.c.mot_de_passe == bindparam('b_ancien'))
+        .values(mot_de_passe=bindparam('b_nouveau'))
+    )
+
+    # Pré-filtre SQL grossier (texte sans « $...$ », méthode héritée, ou méthode différente), affiné en Python
+    filtre = or_(
+        ~Client.mot_de_passe.like('%$%$%'),
+        ~or_(*(Client.mot_de_passe.like(f"{actuelle}%") for actuelle in METHODES_ACTUELLES))
+    )
+    if anciens_hashs:
+        filtre = or_(filtre, ~Client.mot_de_passe.like(f"{methode}$%"))
+
+    dernier_id = 0
+    total = 0
+    while True:
+        lot = (
+            db.session.query(Client.id_client, Client.mot_de_passe)
+            .filter(Client.id_client > dernier_id, filtre)
+            .order_by(Client.id_client)
+            .limit(taille_lot)
+            .all()
+        )
+        if not lot:
+            break
+        dernier_id = lot[-1][0]
+
+        candidats = [(id_client, valeur) for id_client, valeur in lot if _candidat(valeur, methode, anciens_hashs)]
+        if candidats:
+            nouveaux = pool.map(rehacher, [v for _, v in candidats], [methode] * len(candidats), chunksize=16)
+            db.session.execute(stmt, [
+                {'b_id': id_client, 'b_ancien': ancien, 'b_nouveau': nouveau}
+                for (id_client, ancien), nouveau in zip(candidats, nouveaux)
+            ])
+        db.session.commit()
+        total += len(candidats)
+        if progression:
+            progression(total, dernier_id)
+    return total
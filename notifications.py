@@ -0,0 +1,24 @@
+# notifications.py
+# Envoi des emails hors de la requête : le client n'attend pas le serveur SMTP.
+import threading
+
+from flask import current_app
+
+from extensions import mail
+
+
+def _envoyer(app, messages):
+    with app.app_context():
+        for msg in messages:
+            try:
+                mail.send(msg)
+            except Exception as e:
+                app.logger.error(f"Envoi email impossible ({msg.subject}) : {e}")
+
+
+def envoyer_emails_async(messages):
+    # À appeler après le commit : les messages doivent être entièrement construits
+    if not messages:
+        return
+    app = current_app._get_current_object()
+    threading.Thread(target=_envoyer, args=(app, list(messages)), daemon=True).start()
@@ -0,0 +1,183 @@
+# pagination.py
+# Pagination par clé (keyset / seek) : on repart de la dernière ligne affichée
+# au lieu d'un OFFSET, et le total vient d'une estimation du planificateur
+# PostgreSQL sauf si un comptage exact est demandé.
+import json
+from datetime import date, datetime, time
+
+from flask import current_app, request
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_, text
+
+from extensions import db
+
+
+class PageCurseur:
+    def __init__(self, items, suivant, precedent, total, total_exact):
+        self.items = items
+        self.suivant = suivant
+        self.precedent = precedent
+        self.total = total
+        self.total_exact = total_exact
+
+    @property
+    def has_next(self):
+        return self.suivant is not None
+
+    @property
+    def has_prev(self):
+        return self.precedent is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# -------------------------------
+# Curseurs opaques : valeurs des colonnes de tri, signées avec SECRET_KEY
+# -------------------------------
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='pagination-curseur')
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, (date, datetime, time)):
+        return valeur.isoformat()
+    return valeur
+
+
+def _decoder_valeur(colonne, valeur):
+    if valeur is None:
+        return None
+    type_python = colonne.type.python_type
+    if type_python in (date, datetime, time):
+        return type_python.fromisoformat(valeur)
+    return type_python(valeur)
+
+
+def _encoder_curseur(sens, valeurs):
+    return _serializer().dumps({'s': sens, 'v': [_encoder_valeur(v) for v in valeurs]})
+
+
+def _decoder_curseur(curseur, colonnes):
+    # Curseur absent, altéré ou périmé (colonnes de tri changées) : première page
+    if not curseur:
+        return None, None
+    try:
+        donnees = _serializer().loads(curseur)
+        valeurs = [_decoder_valeur(col, v) for (col, _), v in zip(colonnes, donnees['v'])]
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None, None
+    if len(valeurs) != len(colonnes) or donnees.get('s') not in ('apres', 'avant'):
+        return None, None
+    return donnees['s'], valeurs
+
+
+# -------------------------------
+# Prédicat de recherche : (c1, c2, ...) > (v1, v2, ...) en respectant le sens de chaque colonne
+# -------------------------------
+def _apres(colonnes, valeurs, inverse=False):
+    conditions = []
+    for i, ((colonne, desc), valeur) in enumerate(zip(colonnes, valeurs)):
+        descendant = desc != inverse
+        comparaison = colonne < valeur if descendant else colonne > valeur
+        egalites = [col == val for (col, _), val in zip(colonnes[:i], valeurs[:i])]
+        conditions.append(and_(*egalites, comparaison))
+    return or_(*conditions)
+
+
+def _ordre(colonnes, inverse=False):
+    return [col.desc() if desc != inverse else col.asc() for col, desc in colonnes]
+
+
+# -------------------------------
+# Totaux : estimation (pg_class.reltuples / plan EXPLAIN) ou COUNT exact
+# -------------------------------
+def estimer_total(query, table=None):
+    if db.engine.dialect.name != 'postgresql':
+        return query.order_by(None).count(), True
+
+    if table is not None:
+        # Sans filtre, les statistiques de la table suffisent
+        estimation = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {'table': table}
+        ).scalar()
+    else:
+        # Avec filtres : nombre de lignes prévu par le planificateur, sans exécuter la requête
+        instruction = query.order_by(None).statement.compile(dialect=db.engine.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {instruction.string}", instruction.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimation = plan[0]['Plan']['Plan Rows']
+
+    # reltuples vaut -1 tant que la table n'a jamais été analysée
+    if estimation is None or estimation < 0:
+        return query.order_by(None).count(), True
+    return int(estimation), False
+
+
+def paginer(query, colonnes, par_page=10, table=None, total=None):
+    # colonnes : [(colonne, descendant), ...] ; la dernière doit être unique (clé primaire)
+    # total : nombre exact déjà connu (ex. calculé avec les totaux de la liste)
+    curseur = request.args.get('curseur')
+    exact = request.args.get('exact', type=int) == 1
+    sens, valeurs = _decoder_curseur(curseur, colonnes)
+
+    query = base = query.order_by(None)
+    if sens == 'avant':
+        # Page précédente : on parcourt à rebours puis on remet les lignes dans l'ordre
+        query = query.filter(_apres(colonnes, valeurs, inverse=True)).order_by(*_ordre(colonnes, inverse=True))
+    elif sens == 'apres':
+        query = query.filter(_apres(colonnes, valeurs)).order_by(*_ordre(colonnes))
+    else:
+        query = query.order_by(*_ordre(colonnes))
+
+    lignes = query.limit(par_page + 1).all()
+    encore = len(lignes) > par_page
+    items = lignes[:par_page]
+    if sens == 'avant':
+        items.reverse()
+
+    def cle(item):
+        return [_valeur_tri(item, colonne) for colonne, _ in colonnes]
+
+    suivant = precedent = None
+    if items:
+        if sens == 'avant':
+            suivant = _encoder_curseur('apres', cle(items[-1]))
+            if encore:
+                precedent = _encoder_curseur('avant', cle(items[0]))
+        else:
+            if encore:
+                suivant = _encoder_curseur('apres', cle(items[-1]))
+            if sens == 'apres':
+                precedent = _encoder_curseur('avant', cle(items[0]))
+
+    if total is not None:
+        total_exact = True
+    elif exact:
+        total, total_exact = base.count(), True
+    else:
+        total, total_exact = estimer_total(base, table)
+
+    return PageCurseur(items, suivant, precedent, total, total_exact)
+
+
+def _valeur_tri(item, colonne):
+    # Les colonnes de tri peuvent appartenir à une relation chargée (ex. Reservation.date_reservation),
+    # éventuellement aliasée (archives.entites) : on compare à la classe du modèle
+    entite = colonne.parent.mapper.class_
+    if hasattr(item, '_mapping'):
+        # Ligne de colonnes (requête agrégée) : valeur portée par le nom de la colonne
+        return getattr(item, colonne.key)
+    if isinstance(item, entite):
+        return getattr(item, colonne.key)
+    for relation in db.inspect(type(item)).relationships:
+        if relation.mapper.class_ is entite:
+            return getattr(getattr(item, relation.key), colonne.key)
+    raise ValueError(f"Colonne de tri {colonne} introuvable sur {type(item).__name__}")
@@ -0,0 +1,148 @@
+# preparation.py
+# Tableau de préparation cuisine : quantités restant à préparer par plat
+# pour les réservations actives (ni servies ni annulées), gardées en mémoire et mises à jour
+# par les événements de commande / service.
+import threading
+import time as horloge
+from datetime import date, datetime
+
+from sqlalchemy import func
+
+from evenements import bus_evenements
+from models import db, Reservation, ReservationItem, Plat, STATUTS_ACTIFS
+
+
+class TableauPreparation:
+    def __init__(self, ttl=60):
+        # {jour: {'charge_le': float, 'reservations': {id: (heure, {plat_id: qte})}}}
+        self._jours = {}
+        self._noms_plats = {}
+        self._verrou = threading.Lock()
+        self.ttl = ttl
+
+    def init_app(self, app):
+        self.ttl = app.config.setdefault('PREPARATION_TTL', 60)
+        bus_evenements.ecouter(self._sur_evenement)
+
+    # -------------------------------
+    # Chargement : une seule requête groupée pour la journée
+    # -------------------------------
+    def _charger(self, jour):
+        lignes = (
+            db.session.query(
+                Reservation.id_reservation,
+                Reservation.heure_reservation,
+                ReservationItem.plat_id,
+                Plat.nom,
+                func.sum(ReservationItem.quantite)
+            )
+            .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+            .join(Plat, Plat.id_plat == ReservationItem.plat_id)
+            .filter(
+                Reservation.date_reservation == jour,
+                Reservation.active
+            )
+            .group_by(
+                Reservation.id_reservation,
+                Reservation.heure_reservation,
+                ReservationItem.plat_id,
+                Plat.nom
+            )
+            .all()
+        )
+
+        reservations = {}
+        noms = {}
+        for id_reservation, heure, plat_id, nom_plat, quantite in lignes:
+            _, plats = reservations.setdefault(id_reservation, (heure, {}))
+            plats[plat_id] = int(quantite)
+            noms[plat_id] = nom_plat
+
+        etat = {'charge_le': horloge.monotonic(), 'reservations': reservations}
+        with self._verrou:
+            self._noms_plats.update(noms)
+            # Seuls aujourd'hui et le jour demandé restent en mémoire
+            for ancien in [j for j in self._jours if j not in (jour, date.today())]:
+                del self._jours[ancien]
+            self._jours[jour] = etat
+        return etat
+
+    def _etat(self, jour):
+        # Retourne l'état lu ou chargé : un clear() concurrent (status-changed) ne le fait pas disparaître
+        with self._verrou:
+            etat = self._jours.get(jour)
+        if etat is None or horloge.monotonic() - etat['charge_le'] > self.ttl:
+            bus_evenements.assurer_ecoute()
+            etat = self._charger(jour)
+        return etat
+
+    # -------------------------------
+    # Lecture : agrégation en mémoire sur la fenêtre horaire
+    # -------------------------------
+    def quantites(self, jour=None, debut=None, fin=None):
+        jour = jour or date.today()
+        etat = self._etat(jour)
+
+        totaux = {}
+        nb_commandes = 0
+        with self._verrou:
+            for heure, plats in etat['reservations'].values():
+                if debut and heure < debut:
+                    continue
+                if fin and heure > fin:
+                    continue
+                nb_commandes += 1
+                for plat_id, quantite in plats.items():
+                    totaux[plat_id] = totaux.get(plat_id, 0) + quantite
+            noms = dict(self._noms_plats)
+
+        plats = [
+            {'plat_id': plat_id, 'plat': noms.get(plat_id, "Plat inconnu"), 'quantite': quantite}
+            for plat_id, quantite in totaux.items()
+        ]
+        plats.sort(key=lambda p: (-p['quantite'], p['plat']))
+        return {'commandes': nb_commandes, 'plats': plats}
+
+    # -------------------------------
+    # Mises à jour incrémentales
+    # -------------------------------
+    def _sur_evenement(self, type_evenement, donnees):
+        if type_evenement == 'order-created':
+            self._ajouter_commande(donnees)
+        elif type_evenement == 'order-served':
+            self._retirer(donnees.get('ids', []))
+        elif type_evenement == 'status-changed':
+            # Servie, annulée ou supprimée : plus rien à préparer
+            if donnees.get('supprimee') or donnees.get('status') not in STATUTS_ACTIFS:
+                self._retirer([donnees['id']])
+            else:
+                # Une commande peut redevenir active : on recharge au prochain accès
+                with self._verrou:
+                    self._jours.clear()
+        elif type_evenement == 'resync':
+            with self._verrou:
+                self._jours.clear()
+
+    def _ajouter_commande(self, donnees):
+        jour = date.fromisoformat(str(donnees['date']))
+        heure = datetime.strptime(donnees['heure'], '%H:%M').time()
+        plats = {}
+        for item in donnees.get('items', []):
+            plats[item['plat_id']] = plats.get(item['plat_id'], 0) + int(item['quantite'])
+
+        with self._verrou:
+            etat = self._jours.get(jour)
+            if etat is None:
+                return
+            for item in donnees.get('items', []):
+                self._noms_plats[item['plat_id']] = item['plat']
+            etat['reservations'][donnees['id']] = (heure, plats)
+
+    def _retirer(self, ids):
+        with self._verrou:
+            for etat in self._jours.values():
+                for id_reservation in ids:
+                    etat['reservations'].pop(id_reservation, None)
+
+
+tableau_preparation = TableauPreparation()
@@ -0,0 +1,93 @@
+# revenus.py
+# Chiffre d'affaires calculé au prix payé (reservation_items.prix_unitaire),
+# jamais au prix courant du plat : un changement de tarif ne réécrit pas
+# l'historique, et les agrégats se passent de la table plats. L'index
+# couvrant ix_reservation_items_couvrant permet des parcours d'index seul.
+from sqlalchemy import func, desc
+
+from models import db, Client, Plat, Reservation, ReservationItem
+
+
+def montant(ligne=ReservationItem):
+    # SUM(quantite * prix_unitaire), 0 s'il n'y a aucune ligne ; `ligne` : classe ou alias sur l'archive
+    return func.coalesce(func.sum(ligne.total), 0)
+
+
+# -------------------------------
+# Lignes de commande (listes admin)
+# -------------------------------
+def totaux_lignes(query):
+    # Quantité, montant, clients distincts et nombre de lignes en un seul passage
+    total_qte, montant_total, clients, lignes = query.order_by(None).with_entities(
+        func.coalesce(func.sum(ReservationItem.quantite), 0),
+        montant(),
+        func.count(func.distinct(Reservation.id_client)),
+        func.count(ReservationItem.id_item)
+    ).one()
+    return {
+        'total_qte': int(total_qte),
+        'montant_total': float(montant_total),
+        'clients': int(clients),
+        'lignes': int(lignes)
+    }
+
+
+def revenus_par_plat(*filtres, entites=None):
+    # Une ligne par plat : (plat_id, nom, quantité, montant), plus vendus en premier
+    # entites : (Reservation, ReservationItem) des filtres, éventuellement archives.entites(True)
+    R, I = entites or (Reservation, ReservationItem)
+    return (
+        db.session.query(
+            I.plat_id,
+            Plat.nom,
+            func.sum(I.quantite).label('quantite'),
+            montant(I).label('total')
+        )
+        .join(R, R.id_reservation == I.id_reservation)
+        .outerjoin(Plat, Plat.id_plat == I.plat_id)
+        .filter(*filtres)
+        .group_by(I.plat_id, Plat.nom)
+        .order_by(func.sum(I.quantite).desc())
+        .all()
+    )
+
+
+# -------------------------------
+# Clients (tableau de bord)
+# -------------------------------
+def depenses_clients(limite=5):
+    # Meilleurs clients : réservations distinctes (pas une par ligne), montant dépensé, dernière visite
+    return (
+        db.session.query(
+            Client.id_client,
+            Client.nom,
+            func.count(func.distinct(Reservation.id_reservation)).label('nb_reservations'),
+            montant().label('total_depense'),
+            func.max(Reservation.date_reservation).label('derniere_reservation')
+        )
+        .join(Reservation, Reservation.id_client == Client.id_client)
+        .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+        .group_by(Client.id_client, Client.nom)
+        .order_by(desc('total_depense'))
+        .limit(limite)
+        .all()
+    )
+
+
+def depenses_clients_inactifs(seuil, limite=5):
+    # Clients dont la dernière réservation précède le seuil, les plus anciens d'abord
+    return (
+        db.session.query(
+            Client.nom,
+            func.count(func.distinct(Reservation.id_reservation)).label('nb_reservations'),
+            montant().label('total_depense'),
+            func.max(Reservation.date_reservation).label('derniere_reservation')
+        )
+        .outerjoin(Reservation, Reservation.id_client == Client.id_client)
+        .outerjoin(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+        .group_by(Client.id_client, Client.nom)
+        .having(func.max(Reservation.date_reservation) < seuil)
+        .order_by(func.max(Reservation.date_reservation).asc())
+        .limit(limite)
+        .all()
+    )
@@ -1,10 +1,19 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify, current_app
-from models import db, Client, Plat, Reservation, ReservationItem, Categorie, Contact
+from models import db, Client, Plat, Reservation, ReservationItem, Categorie, Contact, StatutReservation
 from datetime import datetime, timedelta
-import json, secrets
-from werkzeug.security import generate_password_hash, check_password_hash
+import json, secrets, io, time
+import click
 from functools import wraps
+from sqlalchemy.exc import IntegrityError
 from flask_mail import Message
+from evenements import bus_evenements
+from telephone import normaliser_telephone
+from pagination import paginer
+from import_clients import importer_clients
+from mots_de_passe import hacher
+from limites import limiter, limiteur
+from identite import client_courant, identite_courante, oublier_identite
+from chargements import charger
 
 client_bp = Blueprint('client', __name__)
 
@@ -25,8 +34,7 @@ def connexion_requise(f):
 # -------------------------------
 @client_bp.route('/')
 def liste_client():
-    page = request.args.get('page', 1, type=int)
-    clients = Client.query.order_by(Client.id_client).paginate(page=page, per_page=10)
+    clients = paginer(Client.query, [(Client.id_client, False)], par_page=10, table='clients')
     return render_template('clients/client.html', clients=clients)
 
 @client_bp.route('/ajouter', methods=['GET', 'POST'])
@@ -45,19 +53,23 @@ def ajouter_client():
         if Client.query.filter_by(email=email).first():
             flash('Cet email est déjà utilisé par un autre client.', 'warning')
             return redirect(url_for('client.ajouter_client'))
-        if telephone and Client.query.filter_by(telephone=telephone).first():
-            flash('Ce numéro de téléphone est déjà utilisé par un autre client.', 'warning')
-            return redirect(url_for('client.ajouter_client'))
-
         if telephone and not telephone.isdigit():
             flash('Le numéro de téléphone doit contenir uniquement des chiffres.', 'danger')
             return redirect(url_for('client.ajouter_client'))
 
+        if telephone and not normaliser_telephone(telephone):
+            flash('Numéro de téléphone invalide.', 'danger')
+            return redirect(url_for('client.ajouter_client'))
+
+        if telephone and Client.query.filter_by(telephone_normalise=normaliser_telephone(telephone)).first():
+            flash('Ce numéro de téléphone est déjà utilisé par un autre client.', 'warning')
+            return redirect(url_for('client.ajouter_client'))
+
         nouveau_client = Client(
             nom=nom,
             email=email,
             telephone=telephone,
-            mot_de_passe=generate_password_hash(password)
+            mot_de_passe=hacher(password)
         )
         try:
             db.session.add(nouveau_client)
@@ -70,6 +82,43 @@ def ajouter_client():
 
     return render_template('clients/ajouter_client.html')
 
+# -------------------------------
+# Import en masse (CSV) : upload admin et commande CLI
+# -------------------------------
+@client_bp.route('/importer', methods=['GET', 'POST'])
+def importer_clients_admin():
+    rapport = None
+    if request.method == 'POST':
+        fichier = request.files.get('fichier')
+        if not fichier or not fichier.filename:
+            flash('Veuillez choisir un fichier CSV.', 'danger')
+            return redirect(url_for('client.importer_clients_admin'))
+        # Lecture en flux du fichier reçu, sans le charger en mémoire
+        flux = io.TextIOWrapper(fichier.stream, encoding='utf-8-sig', newline='')
+        rapport = importer_clients(flux)
+        flash(f"Import terminé : {rapport.inseres} créé(s), {rapport.mis_a_jour} mis à jour, "
+              f"{len(rapport.erreurs)} erreur(s).", 'success' if not rapport.erreurs else 'warning')
+    return render_template('clients/importer_clients.html', rapport=rapport)
+
+
+@client_bp.cli.command('import')
+@click.argument('fichier', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lot', default=1000, help="Nombre de lignes par INSERT ... ON CONFLICT.")
+@click.option('--processus', default=None, type=int, help="Processus de hachage (défaut : nombre de CPU).")
+def importer_clients_cli(fichier, lot, processus):
+    debut = time.monotonic()
+
+    def progression(rapport):
+        print(f"  {rapport.traites} client(s) écrits, {len(rapport.erreurs)} erreur(s)...")
+
+    with open(fichier, encoding='utf-8-sig', newline='') as flux:
+        rapport = importer_clients(flux, taille_lot=lot, processus=processus, progression=progression)
+
+    for ligne, email, message in rapport.erreurs:
+        print(f"Ligne {ligne} ({email or '-'}) : {message}")
+    print(f"{rapport.inseres} créé(s), {rapport.mis_a_jour} mis à jour, "
+          f"{len(rapport.erreurs)} erreur(s) en {time.monotonic() - debut:.1f} s.")
+
 @client_bp.route('/modifier/<int:id>', methods=['GET', 'POST'])
 def modifier_client(id):
     cli = Client.query.get_or_404(id)
@@ -90,6 +139,16 @@ def modifier_client(id):
             flash('Le numéro de téléphone doit contenir uniquement des chiffres.', 'danger')
             return redirect(url_for('client.modifier_client', id=id))
 
+        if telephone and not normaliser_telephone(telephone):
+            flash('Numéro de téléphone invalide.', 'danger')
+            return redirect(url_for('client.modifier_client', id=id))
+
+        if telephone and Client.query.filter(
+            Client.telephone_normalise == normaliser_telephone(telephone), Client.id_client != id
+        ).first():
+            flash('Ce numéro de téléphone est déjà utilisé par un autre client.', 'warning')
+            return redirect(url_for('client.modifier_client', id=id))
+
         cli.nom = nom
         cli.email = email
         cli.telephone = telephone
@@ -121,24 +180,51 @@ def supprimer_client(id):
 @client_bp.route('/profil')
 @connexion_requise
 def profil():
-    client = Client.query.get(session['client_id'])
+    client = identite_courante()
     return render_template('profil/profil.html', client=client)
 
 @client_bp.route('/modifier_profil', methods=['GET', 'POST'])
 @connexion_requise
 def modifier_profil():
-    client = Client.query.get(session['client_id'])
+    client = client_courant()
     if request.method == 'POST':
+        email = request.form.get('email', client.email).strip()
+        telephone = request.form.get('telephone', client.telephone or '').strip()
+
+        if not email:
+            flash('L’email est obligatoire.', 'danger')
+            return redirect(url_for('client.modifier_profil'))
+
+        if Client.query.filter(Client.email == email, Client.id_client != client.id_client).first():
+            flash('Cet email est déjà utilisé par un autre compte.', 'warning')
+            return redirect(url_for('client.modifier_profil'))
+
+        if telephone and not normaliser_telephone(telephone):
+            flash('Numéro de téléphone invalide.', 'danger')
+            return redirect(url_for('client.modifier_profil'))
+
+        if telephone and Client.query.filter(
+            Client.telephone_normalise == normaliser_telephone(telephone), Client.id_client != client.id_client
+        ).first():
+            flash('Ce numéro de téléphone est déjà utilisé par un autre compte.', 'warning')
+            return redirect(url_for('client.modifier_profil'))
+
         client.nom = request.form.get('nom', client.nom)
         client.prenom = request.form.get('prenom', client.prenom)
-        client.email = request.form.get('email', client.email)
-        client.telephone = request.form.get('telephone', client.telephone)
+        client.email = email
+        client.telephone = telephone
         password = request.form.get('password')
         if password:
-            client.mot_de_passe = generate_password_hash(password)
+            client.mot_de_passe = hacher(password)
         try:
             db.session.commit()
+            oublier_identite()
             flash('Profil mis à jour avec succès!', 'success')
+        except IntegrityError:
+            # Email ou téléphone pris entre la vérification et le commit
+            db.session.rollback()
+            flash('Cet email ou ce numéro de téléphone est déjà utilisé par un autre compte.', 'warning')
+            return redirect(url_for('client.modifier_profil'))
         except Exception as e:
             db.session.rollback()
             flash(f"Erreur lors de la mise à jour du profil : {e}", 'danger')
@@ -151,20 +237,29 @@ def modifier_profil():
 @client_bp.route('/menu')
 @connexion_requise
 def menu_client():
-    plats = Plat.query.all()
+    plats = charger(Plat.query, 'plat.menu').all()
     categories = Categorie.query.all()
-    client = Client.query.get(session['client_id'])
-    return render_template('plat/menu.html', plats=plats, categories=categories, client=client)
+    return render_template('plat/menu.html', plats=plats, categories=categories, client=identite_courante())
 
 @client_bp.route('/mes_commandes')
 @connexion_requise
 def mes_commandes():
     client_id = session['client_id']
-    reservations = Reservation.query.filter_by(id_client=client_id).order_by(Reservation.date_reservation.desc()).all()
-    for r in reservations:
-        r.total = sum(item.quantite * float(item.prix_unitaire) for item in r.items)
-    client = Client.query.get(session['client_id'])
-    return render_template('commandes/mes_commandes.html', commandes=reservations, client=client)
+    reservations = (
+        charger(Reservation.query, 'reservation.lignes')
+        .filter_by(id_client=client_id)
+        .order_by(Reservation.date_reservation.desc())
+        .all()
+    )
+    # Même forme que reservation_public.commandes : le gabarit lit items_commandes
+    commandes = [{
+        'id_reservation': reservation.id_reservation,
+        'date_reservation': reservation.date_reservation,
+        'status': reservation.status,
+        'items_commandes': reservation.items,
+        'total': reservation.total
+    } for reservation in reservations]
+    return render_template('commandes/mes_commandes.html', commandes=commandes, client=identite_courante())
 
 # -------------------------------
 # PANIER
@@ -190,18 +285,19 @@ def ajouter_commande_multiple():
         return jsonify({"success": False, "message": "Données incomplètes"}), 400
 
     commande_items = json.loads(commande_data)
-    client = Client.query.get(session['client_id'])
+    client = client_courant()
 
     now = datetime.now()
     reservation = Reservation(
         id_client=client.id_client,
         date_reservation=now.date(),
         heure_reservation=now.time(),
-        status="En attente"
+        status=StatutReservation.EN_ATTENTE
     )
     db.session.add(reservation)
     db.session.flush()
 
+    lignes_evenement = []
     for item in commande_items:
         plat = Plat.query.get(item['id'])
         if plat:
@@ -212,10 +308,18 @@ def ajouter_commande_multiple():
                 prix_unitaire=plat.prix
             )
             db.session.add(ri)
+            lignes_evenement.append({'plat_id': plat.id_plat, 'plat': plat.nom, 'quantite': item['quantite']})
 
     try:
         db.session.commit()
         session['panier'] = []
+        bus_evenements.publier('order-created', {
+            'id': reservation.id_reservation,
+            'client': client.nom,
+            'date': reservation.date_reservation,
+            'heure': reservation.heure_reservation.strftime('%H:%M'),
+            'items': lignes_evenement
+        })
         return jsonify({
             "success": True,
             "client": {"nom": client.nom, "email": client.email, "tel": client.telephone},
@@ -230,14 +334,19 @@ def ajouter_commande_multiple():
 # CONNEXION / INSCRIPTION / DÉCONNEXION
 # -------------------------------
 @client_bp.route('/connexion', methods=['GET', 'POST'])
+@limiter('connexion', 'profil/connexion.html')
 def connexion():
     if request.method == 'POST':
         email = request.form.get('email', '').strip()
         password = request.form.get('password', '').strip()
         client = Client.query.filter_by(email=email).first()
 
-        if client and client.mot_de_passe and check_password_hash(client.mot_de_passe, password):
+        if client and client.check_password(password):
+            # Hash sous la politique actuelle : remplacé pendant qu'on a le mot de passe en clair
+            if client.mettre_a_niveau_mot_de_passe(password):
+                db.session.commit()
             session['client_id'] = client.id_client
+            oublier_identite()
             flash(f"Bienvenue {client.nom} !", "success")
             return redirect(url_for('client.menu_client'))
         flash("Email ou mot de passe incorrect.", "danger")
@@ -245,6 +354,7 @@ def connexion():
     return render_template('profil/connexion.html')
 
 @client_bp.route('/inscription', methods=['GET', 'POST'])
+@limiter('inscription', 'profil/inscription.html')
 def inscription():
     if request.method == 'POST':
         nom = request.form.get('nom')
@@ -267,7 +377,12 @@ def inscription():
             flash("Cet email est déjà utilisé par un autre compte.", "warning")
             return redirect(url_for('client.inscription'))
 
-        if Client.query.filter_by(telephone=telephone).first():
+        tel_normalise = normaliser_telephone(telephone)
+        if not tel_normalise:
+            flash("Numéro de téléphone invalide.", "danger")
+            return redirect(url_for('client.inscription'))
+
+        if Client.query.filter_by(telephone_normalise=tel_normalise).first():
             flash("Ce numéro de téléphone est déjà utilisé par un autre compte.", "warning")
             return redirect(url_for('client.inscription'))
 
@@ -276,7 +391,7 @@ def inscription():
             prenom=prenom,
             email=email,
             telephone=telephone,
-            mot_de_passe=generate_password_hash(password)
+            mot_de_passe=hacher(password)
         )
         try:
             db.session.add(new_client)
@@ -289,9 +404,19 @@ def inscription():
 
     return render_template('profil/inscription.html')
 
+# Rejets du limiteur de débit (compteurs du worker courant)
+@client_bp.route('/limites')
+@connexion_requise
+def compteurs_limites():
+    return jsonify({
+        'stockage': current_app.config['LIMITE_DEBIT_STOCKAGE'],
+        'rejets': limiteur.compteurs()
+    })
+
 @client_bp.route('/deconnexion')
 def deconnexion():
     session.pop('client_id', None)
+    oublier_identite()
     flash("Vous êtes déconnecté.", "info")
     return redirect(url_for('client.connexion'))
 
@@ -335,7 +460,7 @@ def reinitialiser_mot_de_passe(token):
             flash("Les mots de passe ne correspondent pas.", "warning")
             return redirect(request.url)
 
-        client.mot_de_passe = generate_password_hash(nouveau_mdp)
+        client.mot_de_passe = hacher(nouveau_mdp)
         client.reset_token = None
         client.reset_token_expiration = None
         db.session.commit()
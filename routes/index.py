@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request
-from models import db, Categorie, Plat, Client, Reservation, ReservationItem
+from models import db, Categorie, Plat, Client, Reservation, ReservationItem, StatutReservation
 from sqlalchemy import func, extract, desc
+from chargements import charger
+from revenus import depenses_clients, depenses_clients_inactifs
+from archives import archive_demandee, entites as entites_archive
 import calendar
 from datetime import datetime, timedelta
 
@@ -27,30 +30,39 @@ def index():
     devise = request.args.get("devise", "USD")
     symbole = DEVISES.get(devise, "$")
 
+    # Réservations des mois actifs seulement, sauf ?archive=1
+    archive = archive_demandee()
+    R, I = entites_archive(archive)
+
     # ---------------------------
     # Comptages généraux
     # ---------------------------
     nb_clients = Client.query.count()
     nb_plats = Plat.query.count()
     nb_categories = Categorie.query.count()
-    nb_reservations = Reservation.query.count()
-    nb_serv_items = ReservationItem.query.count()
-    nb_clients_servis = Reservation.query.filter_by(status="Servi").count()
+    nb_reservations = db.session.query(func.count(R.id_reservation)).scalar()
+    nb_serv_items = db.session.query(func.count(I.id_item)).scalar()
+    nb_clients_servis = db.session.query(func.count(R.id_reservation)).filter(R.status == StatutReservation.SERVI).scalar()
 
     # ---------------------------
     # Derniers clients et réservations
     # ---------------------------
     derniers_clients = Client.query.order_by(Client.date_creation.desc()).limit(5).all()
-    dernieres_reservations = Reservation.query.order_by(Reservation.date_reservation.desc()).limit(5).all()
+    dernieres_reservations = (
+        charger(Reservation.query, 'reservation.tableau')
+        .order_by(Reservation.date_reservation.desc())
+        .limit(5)
+        .all()
+    )
 
     # ---------------------------
     # Graphiques par mois
     # ---------------------------
     mois_labels = [calendar.month_name[i] for i in range(1, 13)]
-    reservations_par_mois = [
-        Reservation.query.filter(extract('month', Reservation.date_reservation) == m).count()
-        for m in range(1, 13)
-    ]
+    # Une seule requête groupée au lieu d'un COUNT par mois
+    mois = extract('month', R.date_reservation)
+    comptes = dict(db.session.query(mois, func.count(R.id_reservation)).group_by(mois).all())
+    reservations_par_mois = [int(comptes.get(m, 0)) for m in range(1, 13)]
 
     # ---------------------------
     # Top / faibles plats
@@ -105,40 +117,10 @@ def index():
     # ---------------------------
     # Analyse du potentiel client
     # ---------------------------
-    clients_stats = (
-        db.session.query(
-            Client.id_client,
-            Client.nom,
-            func.count(Reservation.id_reservation).label('nb_reservations'),
-            func.coalesce(func.sum(Plat.prix * ReservationItem.quantite), 0).label('total_depense'),
-            func.max(Reservation.date_reservation).label('derniere_reservation')
-        )
-        .join(Reservation, Reservation.id_client == Client.id_client)
-        .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
-        .join(Plat, Plat.id_plat == ReservationItem.plat_id)
-        .group_by(Client.id_client)
-        .order_by(desc('total_depense'))
-        .limit(5)
-        .all()
-    )
+    clients_stats = depenses_clients(limite=5)
 
     seuil_inactif = datetime.now() - timedelta(days=90)
-    clients_inactifs = (
-        db.session.query(
-            Client.nom,
-            func.count(Reservation.id_reservation).label("nb_reservations"),
-            func.coalesce(func.sum(Plat.prix * ReservationItem.quantite), 0).label("total_depense"),
-            func.max(Reservation.date_reservation).label("derniere_reservation")
-        )
-        .outerjoin(Reservation, Reservation.id_client == Client.id_client)
-        .outerjoin(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
-        .outerjoin(Plat, Plat.id_plat == ReservationItem.plat_id)
-        .group_by(Client.id_client)
-        .having(func.max(Reservation.date_reservation) < seuil_inactif)
-        .order_by(func.max(Reservation.date_reservation).asc())
-        .limit(5)
-        .all()
-    )
+    clients_inactifs = depenses_clients_inactifs(seuil_inactif, limite=5)
 
     clients_sans_reservation = (
         db.session.query(Client)
@@ -172,6 +154,7 @@ def index():
     devise=devise,
     symbole=symbole,
     devises=DEVISES,
+    archive=archive,
     clients_stats=clients_stats,
     clients_inactifs=clients_inactifs,
     clients_sans_reservation=clients_sans_reservation
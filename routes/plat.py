@@ -2,6 +2,7 @@ import os
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
 from models import db, Plat, Categorie
+from chargements import charger
 
 # -------------------------------
 # Blueprint pour les plats
@@ -19,7 +20,7 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # -------------------------------
 @plat_bp.route('/', methods=['GET'])
 def liste_plats():
-    plats = Plat.query.order_by(Plat.id_plat).all()  # tri par ID
+    plats = charger(Plat.query, 'plat.liste').order_by(Plat.id_plat).all()  # tri par ID
     return render_template('plat/liste_plats.html', plats=plats)
 
 # -------------------------------
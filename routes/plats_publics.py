@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify
 from models import Plat, Categorie, Client, Avis, db
 from datetime import datetime
+from identite import identite_courante
+from chargements import charger
 
 plats_public_bp = Blueprint('plats_public', __name__)
 
@@ -9,14 +11,14 @@ plats_public_bp = Blueprint('plats_public', __name__)
 # --------------------------
 @plats_public_bp.route('/menu')
 def afficher_menu():
-    client = Client.query.get(session.get('client_id')) if session.get('client_id') else None
+    client = identite_courante()
     categories = Categorie.query.all()
     selected_categorie = request.args.get('categorie', type=int)
 
     if selected_categorie:
-        plats = Plat.query.filter_by(categorie_id=selected_categorie).all()
+        plats = charger(Plat.query, 'plat.menu').filter_by(categorie_id=selected_categorie).all()
     else:
-        plats = Plat.query.all()
+        plats = charger(Plat.query, 'plat.menu').all()
 
     return render_template(
         'plat/menu.html',
@@ -1,6 +1,15 @@
-from flask import Blueprint, render_template, request, jsonify
+import json
+from decimal import Decimal
+
+from flask import Blueprint, render_template, request, jsonify, abort, Response, stream_with_context
+import click
 from models import db, ReservationItem, Reservation, Client, Plat
 from sqlalchemy import or_, func
+from pagination import paginer
+from filtres import requete_items, requete_historique, totaux_historique
+from archives import archive_demandee, entites as entites_archive
+from revenus import totaux_lignes
+from exports import reponse_export, exporter_vers_fichier, requete_export_items, COLONNES_ITEMS
 
 # -------------------------------
 # Blueprint Reservation Items
@@ -17,137 +26,114 @@ reservation_items_bp = Blueprint(
 # -------------------------------
 @reservation_items_bp.route('/', methods=['GET'])
 def list_reservation_items():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
     search = request.args.get('search', '').strip()
+    query = requete_items(search)
 
-    # Construction de la requête principale
-    query = (
-        ReservationItem.query
-        .join(ReservationItem.reservation)
-        .join(ReservationItem.plat)
-        .join(Reservation.client)
-        .order_by(Reservation.date_reservation.desc())
-    )
+    # Totaux en une requête d'agrégat ; son nombre de lignes sert aussi de total à la pagination
+    totaux = totaux_lignes(query)
 
-    if search:
-        query = query.filter(
-            or_(
-                Client.nom.ilike(f"%{search}%"),
-                Client.email.ilike(f"%{search}%"),
-                Client.telephone.ilike(f"%{search}%"),
-                Plat.nom.ilike(f"%{search}%")
-            )
-        )
-
-    # Pagination
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Pagination par clé (date décroissante, id pour départager)
+    pagination = paginer(
+        query,
+        [(Reservation.date_reservation, True), (ReservationItem.id_item, True)],
+        par_page=10,
+        total=totaux['lignes']
+    )
     items = pagination.items
 
-    # Totaux quantités
-    total_qte_query = db.session.query(func.sum(ReservationItem.quantite)) \
-        .join(ReservationItem.reservation) \
-        .join(ReservationItem.plat) \
-        .join(Reservation.client)
-    if search:
-        total_qte_query = total_qte_query.filter(
-            or_(
-                Client.nom.ilike(f"%{search}%"),
-                Client.email.ilike(f"%{search}%"),
-                Client.telephone.ilike(f"%{search}%"),
-                Plat.nom.ilike(f"%{search}%")
-            )
-        )
-    total_qte = total_qte_query.scalar() or 0
-
-    # Montant total
-    montant_total_query = db.session.query(func.sum(ReservationItem.quantite * Plat.prix)) \
-        .join(ReservationItem.reservation) \
-        .join(ReservationItem.plat) \
-        .join(Reservation.client)
-    if search:
-        montant_total_query = montant_total_query.filter(
-            or_(
-                Client.nom.ilike(f"%{search}%"),
-                Client.email.ilike(f"%{search}%"),
-                Client.telephone.ilike(f"%{search}%"),
-                Plat.nom.ilike(f"%{search}%")
-            )
-        )
-    montant_total = float(montant_total_query.scalar() or 0.0)
-
-    # Nombre de clients uniques
-    clients_query = db.session.query(Client.id_client) \
-        .distinct() \
-        .join(Reservation) \
-        .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation) \
-        .join(Plat)
-    if search:
-        clients_query = clients_query.filter(
-            or_(
-                Client.nom.ilike(f"%{search}%"),
-                Client.email.ilike(f"%{search}%"),
-                Client.telephone.ilike(f"%{search}%"),
-                Plat.nom.ilike(f"%{search}%")
-            )
-        )
-    clients = clients_query.count()
-
     # Rendu template
     return render_template(
         'reservation_items/liste_plats_reserves.html',
         items=items,
         pagination=pagination,
         search=search,
-        total_qte=total_qte,
-        montant_total=montant_total,
-        clients=clients
+        total_qte=totaux['total_qte'],
+        montant_total=totaux['montant_total'],
+        clients=totaux['clients']
     )
 
+# -------------------------------
+# Export comptable des lignes de commande (CSV en flux ou XLSX)
+# -------------------------------
+@reservation_items_bp.route('/export', methods=['GET'])
+def export_reservation_items():
+    return reponse_export(requete_export_items, COLONNES_ITEMS, 'lignes_commande')
+
+
+@reservation_items_bp.cli.command('export')
+@click.argument('chemin')
+@click.option('--search', default='', help="Filtre sur le client ou le plat.")
+@click.option('--date-debut', default=None, help="AAAA-MM-JJ")
+@click.option('--date-fin', default=None, help="AAAA-MM-JJ")
+@click.option('--archive', is_flag=True, help="Inclut les réservations archivées.")
+def export_reservation_items_cli(chemin, search, date_debut, date_fin, archive):
+    exporter_vers_fichier(requete_export_items, COLONNES_ITEMS, chemin, search, date_debut, date_fin, archive)
+    print(f"Lignes de commande exportées dans {chemin}")
+
 # -------------------------------
 # Historique d’un client (AJAX)
+# Page JSON : ?curseur=... pour la suite ; ?format=ndjson : historique complet en flux
+# ?archive=1 : inclut les réservations archivées
 # -------------------------------
+def ordre_historique(R=Reservation, I=ReservationItem):
+    return [
+        (R.date_reservation, True),
+        (R.heure_reservation, True),
+        (I.id_item, True),
+    ]
+
+
+def _ligne_historique(plat, quantite, prix_unitaire, date_reservation, heure_reservation, status):
+    quantite = int(quantite or 0)
+    prix_unitaire = float(prix_unitaire or 0)
+    return {
+        "plat": plat,
+        "quantite": quantite,
+        "prix_unitaire": prix_unitaire,
+        "total": quantite * prix_unitaire,
+        "date": date_reservation.strftime('%d/%m/%Y'),
+        "heure": heure_reservation.strftime('%H:%M'),
+        "status": status
+    }
+
+
 @reservation_items_bp.route('/client_history/<int:client_id>', methods=['GET'])
 def client_history(client_id):
-    client = Client.query.get_or_404(client_id)
-
-    items_client = (
-        db.session.query(ReservationItem)
-        .join(ReservationItem.reservation)
-        .join(ReservationItem.plat)
-        .filter(Reservation.id_client == client.id_client)
-        .order_by(Reservation.date_reservation.desc(), Reservation.heure_reservation.desc())
-        .all()
-    )
-
-    history = []
-    total_general = 0.0
-
-    for item in items_client:
-        quantite = float(item.quantite or 0)
-        prix_unitaire = float(item.plat.prix or 0)
-        total = quantite * prix_unitaire
-        total_general += total
-
-        history.append({
-            "plat": item.plat.nom,
-            "quantite": quantite,
-            "prix_unitaire": prix_unitaire,
-            "total": total,
-            "date": item.reservation.date_reservation.strftime('%d/%m/%Y'),
-            "heure": item.reservation.heure_reservation.strftime('%H:%M'),
-            "status": item.reservation.status
-        })
-
-    # Ajouter le total cumulé comme dernier élément
-    history.append({
-        "plat": "TOTAL",
-        "quantite": "",
-        "prix_unitaire": "",
-        "total": total_general,
-        "date": "",
-        "heure": "",
-        "status": ""
+    if db.session.query(Client.id_client).filter_by(id_client=client_id).first() is None:
+        abort(404)
+
+    entites = entites_archive(archive_demandee())
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(_flux_historique(client_id, entites)), mimetype='application/x-ndjson')
+
+    par_page = min(max(request.args.get('par_page', 20, type=int), 1), 100)
+    totaux = totaux_historique(client_id, entites)
+    page = paginer(requete_historique(client_id, entites), ordre_historique(*entites),
+                   par_page=par_page, total=totaux['lignes'])
+
+    return jsonify({
+        "items": [
+            _ligne_historique(item.plat.nom, item.quantite, item.prix_unitaire,
+                              item.reservation.date_reservation, item.reservation.heure_reservation,
+                              item.reservation.status)
+            for item in page.items
+        ],
+        "total_general": totaux['total_general'],
+        "lignes": totaux['lignes'],
+        "suivant": page.suivant
     })
 
-    return jsonify(history)
+
+def _flux_historique(client_id, entites):
+    # Tuples bruts lus par lots : une ligne JSON par commande, puis le total
+    R, I = entites
+    query = requete_historique(client_id, entites).with_entities(
+        Plat.nom, I.quantite, I.prix_unitaire,
+        R.date_reservation, R.heure_reservation, R.status
+    ).order_by(*[colonne.desc() for colonne, _ in ordre_historique(R, I)])
+
+    total_general = Decimal(0)
+    for ligne in query.yield_per(1000):
+        total_general += (ligne.prix_unitaire or 0) * (ligne.quantite or 0)
+        yield json.dumps(_ligne_historique(*ligne), ensure_ascii=False) + "\n"
+    yield json.dumps({"plat": "TOTAL", "total": float(total_general)}) + "\n"
@@ -1,5 +1,11 @@
-from flask import Blueprint, request, redirect, url_for, flash, session, send_file, jsonify, render_template
-from models import db, Client, Reservation, ReservationItem, Plat
+from flask import Blueprint, request, redirect, url_for, flash, session, send_file, jsonify, render_template, abort, current_app, Response, stream_with_context
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import update, case, func
+from chargements import charger
+from revenus import revenus_par_plat
+from archives import archive_demandee, entites as entites_archive
+import hashlib, hmac, queue
+from models import db, Client, Reservation, ReservationItem, Plat, StatutReservation, STATUTS_ACTIFS, statuts_vers
 import json
 from datetime import datetime, date
 import io, base64, qrcode
@@ -13,11 +19,20 @@ import base64
 from flask import jsonify
 from weasyprint import HTML
 from extensions import mail
+from evenements import bus_evenements
+from preparation import tableau_preparation
+from capacite import reserver_creneau, disponibilites, creneau_de, fenetre_disponibilites
+from liste_attente import files_attente
+from telephone import normaliser_telephone
+from pagination import paginer
 
 
 
 reservation_public_bp = Blueprint('reservation_public', __name__)
 
+# Nombre maximal de tickets servis ou synchronisés par appel (le scanner envoie ses lots par tranches)
+MAX_TICKETS_LOT = 200
+
 # -----------------------------
 # Filtre Jinja pour échapper en JS
 # -----------------------------
@@ -115,28 +130,28 @@ def commandes():
         flash("Veuillez vous connecter pour voir vos commandes.", "warning")
         return redirect(url_for('reservation_public.mon_panier'))
 
-    commandes = Reservation.query.filter_by(id_client=client_id).order_by(Reservation.date_reservation.desc()).all()
+    commandes = (
+        charger(Reservation.query, 'reservation.lignes')
+        .filter_by(id_client=client_id)
+        .order_by(Reservation.date_reservation.desc())
+        .all()
+    )
     commandes_list = []
 
     for cmd in commandes:
-        items = []
-        total = 0
-        for item in cmd.items:
-            prix_total_item = item.quantite * item.prix_unitaire
-            items.append({
-                'plat': item.plat,
-                'quantite': item.quantite,
-                'prix_unitaire': item.prix_unitaire,
-                'total_item': prix_total_item
-            })
-            total += prix_total_item
+        items = [{
+            'plat': item.plat,
+            'quantite': item.quantite,
+            'prix_unitaire': item.prix_unitaire,
+            'total_item': item.total
+        } for item in cmd.items]
 
         commandes_list.append({
             'id_reservation': cmd.id_reservation,
             'date_reservation': cmd.date_reservation,
-            'status': getattr(cmd, 'status', 'En attente'),
+            'status': cmd.status,
             'items_commandes': items,
-            'total': total
+            'total': cmd.total
         })
 
     return render_template('commandes/mes_commandes.html', commandes=commandes_list)
@@ -161,12 +176,19 @@ def ajouter_commande_multiple():
         if not items:
             return jsonify({'success': False, 'message': "Le panier est vide."})
 
-        client = Client.query.filter_by(telephone=tel_client).first()
+        tel_normalise = normaliser_telephone(tel_client)
+        if not tel_normalise:
+            return jsonify({'success': False, 'message': "Numéro de téléphone invalide."})
+
+        # Recherche indexée sur la forme normalisée (+243..., 0..., espaces, tirets)
+        client = Client.query.filter_by(telephone_normalise=tel_normalise).first()
         if not client:
             client = Client(
                 nom=nom_client,
-                email=email_client or f"{tel_client}@exemple.com",
-                telephone=tel_client
+                email=email_client or f"{tel_normalise.lstrip('+')}@exemple.com",
+                telephone=tel_client,
+                # Compte invité : aucun mot de passe utilisable tant qu'il n'en définit pas
+                mot_de_passe='!'
             )
             db.session.add(client)
             db.session.flush()
@@ -184,6 +206,7 @@ def ajouter_commande_multiple():
 
         total_commande = 0
         items_ajoutes = 0
+        lignes_evenement = []
         for item in items:
             plat_id = item.get('id')
             quantite = int(item.get('quantite', 1))
@@ -202,6 +225,7 @@ def ajouter_commande_multiple():
             )
             db.session.add(res_item)
             items_ajoutes += 1
+            lignes_evenement.append({'plat_id': plat.id_plat, 'plat': plat.nom, 'quantite': quantite})
 
         if items_ajoutes == 0:
             db.session.rollback()
@@ -211,6 +235,14 @@ def ajouter_commande_multiple():
         session.pop('panier', None)
         session.modified = True
 
+        bus_evenements.publier('order-created', {
+            'id': reservation.id_reservation,
+            'client': client.nom,
+            'date': reservation.date_reservation,
+            'heure': reservation.heure_reservation.strftime('%H:%M'),
+            'items': lignes_evenement
+        })
+
         return jsonify({
             'success': True,
             'reservation_id': reservation.id_reservation,
@@ -233,12 +265,6 @@ def ticket(reservation_id):
         flash("Aucun plat réservé pour cette réservation.", "warning")
         return redirect(url_for('reservation_public.mon_panier'))
 
-    # Préparer le total correct
-    total = sum(
-        item.quantite * (item.prix_unitaire if item.prix_unitaire else (item.plat.prix if item.plat else 0))
-        for item in items
-    )
-
     # Générer QR code en base64
     qr_img = qrcode.make(reservation.qrcode_data)
     buffer = io.BytesIO()
@@ -250,7 +276,7 @@ def ticket(reservation_id):
         reservation=reservation,
         client=client,
         items=items,
-        total=total,
+        total=reservation.total,
         qr_b64=qr_b64
     )
 
@@ -311,11 +337,8 @@ def telecharger_ticket(reservation_id):
     y -= LINE_HEIGHT
 
     pdf.setFont("Courier", 8)
-    total = 0
     for item in items:
-        prix = item.prix_unitaire if item.prix_unitaire is not None else (item.plat.prix if item.plat else 0)
-        item_total = item.quantite * prix
-        total += item_total
+        item_total = item.total
         nom = item.plat.nom if item.plat else "Plat inconnu"
         pdf.drawString(MARGIN, y, f"{nom} x{item.quantite}")
         pdf.drawRightString(TICKET_WIDTH-MARGIN, y, f"${item_total:.2f}")
@@ -331,7 +354,7 @@ def telecharger_ticket(reservation_id):
     # --- Total ---
     pdf.setFont("Courier-Bold", 9)
     pdf.drawString(MARGIN, y, "Total:")
-    pdf.drawRightString(TICKET_WIDTH-MARGIN, y, f"${total:.2f}")
+    pdf.drawRightString(TICKET_WIDTH-MARGIN, y, f"${reservation.total:.2f}")
     y -= LINE_HEIGHT + 2
 
     # --- QR code centré ---
@@ -403,7 +426,7 @@ def recommander_commande(reservation_id):
 # -----------------------------
 @reservation_public_bp.route('/scanner')
 def scanner_page():
-    return render_template("scanner.html")
+    return render_template("scanner.html", max_tickets_lot=MAX_TICKETS_LOT)
 
 # -----------------------------
 # Scanner : API vérification QR
@@ -421,18 +444,18 @@ def scanner_verify():
         if not reservation:
             return jsonify({"success": False, "message": "Réservation introuvable."})
 
-        if getattr(reservation, "status", "En attente") == "Servi":
+        if reservation.status == StatutReservation.SERVI:
             return jsonify({"success": False, "message": "Ce ticket a déjà été utilisé (client déjà servi)."})
+        if not reservation.peut_passer_a(StatutReservation.SERVI):
+            return jsonify({"success": False, "message": f"Réservation {reservation.statut} : ticket non valable."})
 
         client = reservation.client
         items = [{
             "plat": item.plat.nom if item.plat else "Plat inconnu",
             "quantite": item.quantite,
-            "prix": item.prix_unitaire
+            "prix": float(item.prix_unitaire)
         } for item in reservation.items]
 
-        total = sum(i["prix"] * i["quantite"] for i in items)
-
         return jsonify({
             "success": True,
             "reservation_id": reservation.id_reservation,
@@ -441,9 +464,9 @@ def scanner_verify():
                 "email": client.email,
                 "tel": client.telephone
             },
-            "status": getattr(reservation, "status", "En attente"),
+            "status": reservation.status,
             "items": items,
-            "total": total
+            "total": float(reservation.total)
         })
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
@@ -451,83 +474,401 @@ def scanner_verify():
 # -----------------------------
 # Marquer une réservation comme servie
 # -----------------------------
+def servir_reservations(reservation_ids, horodatages=None):
+    # Un seul UPDATE conditionnel : seules les lignes encore non servies
+    # passent à "Servi", et RETURNING indique quels scans ont gagné.
+    # horodatages : {id_reservation: datetime} pour les scans faits hors ligne.
+    maintenant = datetime.now()
+    servi_le = (
+        case(horodatages, value=Reservation.id_reservation, else_=maintenant)
+        if horodatages else maintenant
+    )
+    stmt = (
+        update(Reservation)
+        .where(
+            Reservation.id_reservation.in_(reservation_ids),
+            Reservation.status.in_(statuts_vers(StatutReservation.SERVI))
+        )
+        .values(status=StatutReservation.SERVI, servi_le=servi_le)
+        .returning(Reservation.id_reservation)
+        .execution_options(synchronize_session=False)
+    )
+    return [row[0] for row in db.session.execute(stmt)]
+
+
+def corps_json():
+    # Corps JSON objet ou None : un corps absent, mal formé ou d'un autre type donne un 400
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+def motifs_refus(restants):
+    # Tickets non servis d'un lot : déjà servis, dans un statut qui l'interdit (annulés) ou inexistants
+    statuts = dict(
+        db.session.query(Reservation.id_reservation, Reservation.status)
+        .filter(Reservation.id_reservation.in_(restants))
+    ) if restants else {}
+    deja_servis = {i for i, statut in statuts.items() if statut == StatutReservation.SERVI}
+    return {
+        "deja_servis": sorted(deja_servis),
+        "non_valables": sorted(set(statuts) - deja_servis),
+        "introuvables": sorted(set(restants) - set(statuts)),
+    }
+
+
 @reservation_public_bp.route('/scanner/serve/<int:reservation_id>', methods=['POST'])
 def scanner_serve(reservation_id):
     try:
-        reservation = Reservation.query.get_or_404(reservation_id)
+        servis = servir_reservations([reservation_id])
+        db.session.commit()
+
+        if servis:
+            bus_evenements.publier('order-served', {'ids': servis})
+            return jsonify({"success": True, "message": "Client servi avec succès."})
 
-        if getattr(reservation, "status", "En attente") == "Servi":
-            return jsonify({"success": False, "message": "Ce client a déjà été servi."})
+        # Aucun gagnant : réservation inexistante, déjà servie ou dans un statut qui l'interdit
+        reservation = db.session.get(Reservation, reservation_id)
+        if not reservation:
+            abort(404)
+        if reservation.status != StatutReservation.SERVI:
+            return jsonify({"success": False, "message": f"Réservation {reservation.statut} : ticket non valable."})
+        return jsonify({"success": False, "message": "Ce client a déjà été servi."})
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": str(e)})
 
-        reservation.status = "Servi"
+# -----------------------------
+# Servir plusieurs tickets d'un groupe en un seul appel
+# -----------------------------
+@reservation_public_bp.route('/scanner/serve', methods=['POST'])
+def scanner_serve_bulk():
+    data = corps_json()
+    if data is None:
+        return jsonify({"success": False, "message": "Corps JSON attendu."}), 400
+    try:
+        reservation_ids = {int(i) for i in data.get("reservation_ids", [])}
+        if not reservation_ids:
+            return jsonify({"success": False, "message": "Aucune réservation fournie."}), 400
+        if len(reservation_ids) > MAX_TICKETS_LOT:
+            return jsonify({"success": False, "message": f"{MAX_TICKETS_LOT} tickets au maximum par appel."}), 400
+
+        servis = servir_reservations(list(reservation_ids))
         db.session.commit()
-        return jsonify({"success": True, "message": "Client servi avec succès."})
+        if servis:
+            bus_evenements.publier('order-served', {'ids': servis})
+
+        return jsonify({
+            "success": bool(servis),
+            "servis": sorted(servis),
+            **motifs_refus(reservation_ids - set(servis)),
+            "message": f"{len(servis)} ticket(s) servi(s)."
+        })
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Identifiants de réservation invalides."}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": str(e)})
 
 # -----------------------------
-# Clients servis
+# Scanner hors ligne : manifeste signé des tickets du jour
 # -----------------------------
-@reservation_public_bp.route('/clients-servis')
-def clients_servis():
-    clients_query = (
-        Client.query
-        .join(Reservation)
-        .filter(Reservation.status == "Servi")
-        .order_by(Client.nom.asc())
+def signer_manifeste(payload):
+    contenu = json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str)
+    return hmac.new(current_app.config['SECRET_KEY'].encode(), contenu.encode(), hashlib.sha256).hexdigest()
+
+
+@reservation_public_bp.route('/scanner/manifest')
+def scanner_manifest():
+    jour = date.today()
+    lignes = (
+        db.session.query(
+            Reservation.id_reservation,
+            Reservation.qrcode_data,
+            Client.nom,
+            Plat.nom,
+            ReservationItem.quantite,
+            ReservationItem.prix_unitaire
+        )
+        .outerjoin(Client, Client.id_client == Reservation.id_client)
+        .outerjoin(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+        .outerjoin(Plat, Plat.id_plat == ReservationItem.plat_id)
+        .filter(
+            Reservation.date_reservation == jour,
+            Reservation.qrcode_data.isnot(None),
+            # Le manifeste hors ligne ne contient que les tickets encore servables (pas les annulés)
+            Reservation.active
+        )
+        .order_by(Reservation.id_reservation)
+        .all()
+    )
+
+    # Format compact : code -> [id, client, [[plat, quantité, prix], ...]]
+    tickets = {}
+    for id_reservation, code, nom_client, nom_plat, quantite, prix in lignes:
+        ticket = tickets.setdefault(code, [id_reservation, nom_client or "Inconnu", []])
+        if quantite:
+            ticket[2].append([nom_plat or "Plat inconnu", quantite, float(prix or 0)])
+
+    payload = {"date": jour.isoformat(), "tickets": tickets}
+    signature = signer_manifeste(payload)
+
+    if request.if_none_match.contains(signature):
+        return "", 304
+    response = jsonify({**payload, "signature": signature})
+    response.set_etag(signature)
+    return response
+
+# -----------------------------
+# Scanner hors ligne : synchronisation groupée des scans "servis"
+# -----------------------------
+@reservation_public_bp.route('/scanner/sync', methods=['POST'])
+def scanner_sync():
+    data = corps_json()
+    if data is None:
+        return jsonify({"success": False, "message": "Corps JSON attendu."}), 400
+    try:
+        events = data.get("events", [])
+        if len(events) > MAX_TICKETS_LOT:
+            return jsonify({"success": False, "message": f"{MAX_TICKETS_LOT} événements au maximum par appel."}), 400
+        horodatages = {}
+        for event in events:
+            reservation_id = int(event["reservation_id"])
+            servi_le = datetime.fromisoformat(event["served_at"]) if event.get("served_at") else datetime.now()
+            if servi_le.tzinfo:
+                servi_le = servi_le.astimezone().replace(tzinfo=None)
+            # Un même ticket scanné plusieurs fois : on garde le premier scan
+            if reservation_id not in horodatages or servi_le < horodatages[reservation_id]:
+                horodatages[reservation_id] = servi_le
+
+        if not horodatages:
+            return jsonify({"success": True, "servis": [], **motifs_refus(set())})
+
+        # Une seule transaction ; rejouer le même lot ne change rien
+        servis = servir_reservations(list(horodatages), horodatages)
+        db.session.commit()
+        if servis:
+            bus_evenements.publier('order-served', {'ids': servis})
+
+        # Les refus sont renvoyés au scanner, qui les signale (ticket servi ailleurs entre-temps, annulé...)
+        return jsonify({
+            "success": True,
+            "servis": sorted(servis),
+            **motifs_refus(set(horodatages) - set(servis))
+        })
+    except (KeyError, TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({"success": False, "message": "Événements de synchronisation invalides."}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": str(e)})
+
+# -----------------------------
+# Flux SSE : événements commandes (cuisine / service)
+# -----------------------------
+@reservation_public_bp.route('/evenements')
+def flux_evenements():
+    file_attente = bus_evenements.abonner()
+
+    def generer():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = file_attente.get(timeout=15)
+                except queue.Empty:
+                    # Battement de cœur : garde la connexion ouverte derrière les proxys
+                    yield ": ping\n\n"
+                    continue
+                evenement = json.loads(message)
+                yield f"event: {evenement['type']}\ndata: {json.dumps(evenement['data'])}\n\n"
+                if evenement['type'] == 'resync':
+                    # Abonné abandonné par le bus : fin du flux, le navigateur se reconnecte et relit tout
+                    return
+        finally:
+            bus_evenements.desabonner(file_attente)
+
+    return Response(
+        stream_with_context(generer()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# -----------------------------
+# Écran cuisine : commandes du jour en attente, mises à jour via SSE
+# -----------------------------
+@reservation_public_bp.route('/cuisine')
+def ecran_cuisine():
+    lignes = (
+        db.session.query(
+            Reservation.id_reservation,
+            Reservation.heure_reservation,
+            Client.nom,
+            Plat.id_plat,
+            Plat.nom,
+            ReservationItem.quantite
+        )
+        .join(ReservationItem, ReservationItem.id_reservation == Reservation.id_reservation)
+        .join(Plat, Plat.id_plat == ReservationItem.plat_id)
+        .outerjoin(Client, Client.id_client == Reservation.id_client)
+        .filter(
+            Reservation.date_reservation == date.today(),
+            Reservation.active
+        )
+        .order_by(Reservation.heure_reservation, Reservation.id_reservation)
         .all()
     )
 
-    clients = []
-    today = date.today()
-
-    for client in clients_query:
-        served_reservations = [r for r in client.reservations if getattr(r, 'status', '') == 'Servi']
-        total_served = len(served_reservations)
-        last_reservation = max(served_reservations, key=lambda r: r.date_reservation, default=None)
-        
-        clients.append({
-            'id_client': client.id_client,
-            'nom': client.nom,
-            'email': client.email,
-            'telephone': client.telephone,
-            'total_served': total_served,
-            'last_reservation': last_reservation,
+    commandes = {}
+    for id_reservation, heure, nom_client, plat_id, nom_plat, quantite in lignes:
+        commande = commandes.setdefault(id_reservation, {
+            'id': id_reservation,
+            'client': nom_client or "Inconnu",
+            'heure': heure.strftime('%H:%M') if heure else '',
+            'items': []
         })
+        commande['items'].append({'plat_id': plat_id, 'plat': nom_plat, 'quantite': quantite})
+
+    return render_template(
+        'cuisine/ecran_cuisine.html',
+        commandes=list(commandes.values()),
+        statuts_actifs=[statut.value for statut in STATUTS_ACTIFS]
+    )
+
+# -----------------------------
+# Tableau de préparation : quantités restant à préparer par plat
+# -----------------------------
+def lire_fenetre_preparation():
+    jour = request.args.get('date', '').strip()
+    debut = request.args.get('debut', '').strip()
+    fin = request.args.get('fin', '').strip()
+    return (
+        datetime.strptime(jour, "%Y-%m-%d").date() if jour else date.today(),
+        datetime.strptime(debut, "%H:%M").time() if debut else None,
+        datetime.strptime(fin, "%H:%M").time() if fin else None,
+    )
+
+
+@reservation_public_bp.route('/preparation')
+def tableau_preparation_page():
+    try:
+        jour, debut, fin = lire_fenetre_preparation()
+    except ValueError:
+        flash("Date ou heure invalide.", "danger")
+        jour, debut, fin = date.today(), None, None
+    return render_template(
+        'cuisine/preparation.html',
+        jour=jour,
+        debut=debut,
+        fin=fin,
+        preparation=tableau_preparation.quantites(jour, debut, fin)
+    )
+
+
+@reservation_public_bp.route('/preparation/data')
+def tableau_preparation_data():
+    try:
+        jour, debut, fin = lire_fenetre_preparation()
+    except ValueError:
+        return jsonify({"success": False, "message": "Date ou heure invalide."}), 400
+    return jsonify({"success": True, "date": jour.isoformat(), **tableau_preparation.quantites(jour, debut, fin)})
+
+# -----------------------------
+# Clients servis
+# -----------------------------
+@reservation_public_bp.route('/clients-servis')
+def clients_servis():
+    date_debut = request.args.get('date_debut', '').strip()
+    date_fin = request.args.get('date_fin', '').strip()
+    archive = archive_demandee()
+    R, _ = entites_archive(archive)
+
+    filtres = [R.status == StatutReservation.SERVI]
+    try:
+        if date_debut:
+            filtres.append(R.date_reservation >= datetime.strptime(date_debut, "%Y-%m-%d").date())
+        if date_fin:
+            filtres.append(R.date_reservation <= datetime.strptime(date_fin, "%Y-%m-%d").date())
+    except ValueError:
+        flash("Format de date invalide (AAAA-MM-JJ).", "danger")
+
+    # Une ligne par client : nombre de réservations servies et dernière date, calculés en SQL
+    query = (
+        db.session.query(
+            Client.id_client,
+            Client.nom,
+            Client.email,
+            Client.telephone,
+            func.count(R.id_reservation).label('total_servis'),
+            func.max(R.date_reservation).label('derniere_date')
+        )
+        .join(R, R.id_client == Client.id_client)
+        .filter(*filtres)
+        .group_by(Client.id_client, Client.nom, Client.email, Client.telephone)
+    )
+    pagination = paginer(query, [(Client.nom, False), (Client.id_client, False)], par_page=50)
 
     return render_template(
         'clients/clients_servis.html',
-        clients=clients,
-        today=today
+        clients=pagination.items,
+        pagination=pagination,
+        date_debut=date_debut,
+        date_fin=date_fin,
+        archive=archive,
+        today=date.today()
     )
-    
+
 @reservation_public_bp.route('/liste_reservations')
 def liste_reservations():
-    search = request.args.get('search', '')
+    search = request.args.get('search', '').strip()
+    date_debut = request.args.get('date_debut', '').strip()
+    date_fin = request.args.get('date_fin', '').strip()
+    archive = archive_demandee()
+    entites = R, I = entites_archive(archive)
 
-    # Récupérer toutes les réservations ou filtrer selon search
+    filtres = []
     if search:
-        reservations = ReservationItem.query.join(Plat).filter(Plat.nom.ilike(f"%{search}%")).all()
-    else:
-        reservations = ReservationItem.query.all()
-
-    # Calculer le total par plat
-    plats_sommes = {}
-    for item in reservations:
-        nom_plat = item.plat.nom if item.plat else "Plat inconnu"
-        prix = item.prix_unitaire if item.prix_unitaire is not None else (item.plat.prix if item.plat else 0)
-        if nom_plat in plats_sommes:
-            plats_sommes[nom_plat]['quantite'] += item.quantite
-            plats_sommes[nom_plat]['total'] += prix * item.quantite
-        else:
-            plats_sommes[nom_plat] = {'quantite': item.quantite, 'total': prix * item.quantite}
+        filtres.append(Plat.nom.ilike(f"%{search}%"))
+    try:
+        if date_debut:
+            filtres.append(R.date_reservation >= datetime.strptime(date_debut, "%Y-%m-%d").date())
+        if date_fin:
+            filtres.append(R.date_reservation <= datetime.strptime(date_fin, "%Y-%m-%d").date())
+    except ValueError:
+        flash("Format de date invalide (AAAA-MM-JJ).", "danger")
+
+    # Totaux par plat calculés en SQL : une ligne par plat, jamais la table entière
+    sommes = revenus_par_plat(*filtres, entites=entites)
+    # Clé plat_id : deux plats de même nom (ou plusieurs plats supprimés) ne s'écrasent pas
+    plats_sommes = {
+        plat_id: {'plat': nom or "Plat inconnu", 'quantite': int(quantite or 0), 'total': float(total or 0)}
+        for plat_id, nom, quantite, total in sommes
+    }
+
+    # Lignes de détail paginées par clé, relations chargées en jointure
+    lignes = (
+        db.session.query(I)
+        .join(I.reservation.of_type(R))
+        .outerjoin(Plat, Plat.id_plat == I.plat_id)
+        .filter(*filtres)
+    )
+    pagination = paginer(
+        charger(lignes, 'ligne.detail', entites),
+        [(R.date_reservation, True), (I.id_item, True)],
+        par_page=20,
+        table=None if filtres or archive else 'reservation_items'
+    )
 
     return render_template(
         'liste_reservations.html',
-        reservations=reservations,
+        items=pagination.items,
+        pagination=pagination,
         search=search,
-        plats_sommes=plats_sommes  
+        date_debut=date_debut,
+        date_fin=date_fin,
+        archive=archive,
+        plats_sommes=plats_sommes
     )
 
 
@@ -553,11 +894,28 @@ def reserver_table():
 
         date_res = datetime.strptime(date_str, "%Y-%m-%d").date()
         heure_res = datetime.strptime(heure_str, "%H:%M").time()
+        nb_personnes = int(personnes)
+        if nb_personnes < 1:
+            flash("Le nombre de personnes doit être au moins 1.", "danger")
+            return redirect(url_for('reservation_public.mon_panier'))
 
-        # Vérifier disponibilité max 10 tables
-        existing = Reservation.query.filter_by(date_reservation=date_res, heure_reservation=heure_res).count()
-        if existing >= 10:
-            flash("Désolé, aucune table disponible à cette heure.", "warning")
+        # Décrément atomique de la capacité du créneau (couverts + tables)
+        id_creneau, erreur = reserver_creneau(date_res, heure_res, nb_personnes)
+        if erreur:
+            db.session.rollback()
+            creneau = creneau_de(date_res, heure_res) if request.form.get('liste_attente') else None
+            if creneau and nb_personnes <= creneau.couverts_max:
+                # Créneau complet : inscription en liste d'attente plutôt qu'un nouvel essai
+                attente = files_attente.inscrire(creneau.id_creneau, nom, prenom, email, tel, nb_personnes)
+            else:
+                attente = None
+            if attente:
+                # Une seconde inscription du même email ou téléphone renvoie la demande existante
+                db.session.commit()
+                flash("Ce créneau est complet : vous êtes inscrit(e) sur la liste d'attente. "
+                      "Nous vous enverrons un email si une table se libère.", "info")
+            else:
+                flash(erreur, "warning")
             return redirect(url_for('reservation_public.mon_panier'))
 
         # Création réservation
@@ -568,9 +926,10 @@ def reserver_table():
             telephone=tel,
             date_reservation=date_res,
             heure_reservation=heure_res,
-            nombre_personnes=int(personnes),
-            status="En attente",
-            qrcode_data=f"{tel}_{datetime.now().timestamp()}"
+            nombre_personnes=nb_personnes,
+            status=StatutReservation.EN_ATTENTE,
+            qrcode_data=f"{tel}_{datetime.now().timestamp()}",
+            id_creneau=id_creneau
         )
         db.session.add(new_res)
         db.session.commit()
@@ -588,6 +947,38 @@ def reserver_table():
         return redirect(url_for('reservation_public.mon_panier'))
 
 
+# ---------------------------
+# Disponibilités des créneaux sur une période
+# ---------------------------
+@reservation_public_bp.route('/disponibilites')
+def disponibilites_creneaux():
+    try:
+        debut_str = request.args.get('debut', '').strip()
+        debut = datetime.strptime(debut_str, "%Y-%m-%d").date() if debut_str else date.today()
+        nb_jours = min(max(request.args.get('jours', 14, type=int), 1), 60)
+        personnes = max(request.args.get('personnes', 1, type=int), 1)
+    except ValueError:
+        return jsonify({"success": False, "message": "Paramètres invalides."}), 400
+
+    premier, dernier = fenetre_disponibilites()
+    if not premier <= debut <= dernier:
+        return jsonify({"success": False, "message": f"Dates consultables du {premier:%d/%m/%Y} au {dernier:%d/%m/%Y}."}), 400
+    nb_jours = min(nb_jours, (dernier - debut).days + 1)
+
+    # Les créneaux viennent du cache partagé : on ne les modifie pas en place
+    jours = [{
+        'date': jour['date'],
+        'creneaux': [
+            {**creneau, 'disponible': creneau['tables_restantes'] >= 1 and creneau['couverts_restants'] >= personnes}
+            for creneau in jour['creneaux']
+        ]
+    } for jour in disponibilites(debut, nb_jours)]
+
+    response = jsonify({"success": True, "personnes": personnes, "jours": jours})
+    response.headers['Cache-Control'] = 'private, max-age=30'
+    return response
+
+
 # ---------------------------
 # Route pour afficher le ticket en ligne
 # ---------------------------
@@ -1,5 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
-from models import db, Client, Reservation, ReservationItem, Plat
+import click
+from models import (
+    db, Client, Reservation, ReservationItem, Plat, StatutReservation, TransitionInvalide,
+    totaux_calcules, recalculer_totaux
+)
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
 import io
@@ -9,6 +13,15 @@ from reportlab.lib.colors import black, white
 from reportlab.lib.utils import ImageReader
 import qrcode
 from datetime import datetime
+from evenements import bus_evenements
+from capacite import reserver_creneau, liberer_creneau
+from liste_attente import files_attente, messages_promotion
+from notifications import envoyer_emails_async
+from pagination import paginer
+from filtres import requete_items
+from revenus import totaux_lignes
+from exports import reponse_export, exporter_vers_fichier, requete_export_reservations, COLONNES_RESERVATIONS
+from archives import a_archiver, archiver, seuil_archivage, TAILLE_LOT
 
 reservation_bp = Blueprint(
     'reservation',
@@ -21,27 +34,83 @@ reservation_bp = Blueprint(
 # -----------------------------
 @reservation_bp.route('/', methods=['GET'])
 def liste_reservations():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-
-    query = Reservation.query.join(Client)
     search = request.args.get('search', '').strip()
-    if search:
-        query = query.filter(
-            (Client.nom.ilike(f"%{search}%")) |
-            (Client.email.ilike(f"%{search}%")) |
-            (Client.telephone.ilike(f"%{search}%"))
-        )
-
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Le gabarit affiche une ligne par plat réservé : pagination sur les lignes de commande,
+    # réservation, client et plat chargés par les jointures de requete_items
+    query = requete_items(search)
+
+    pagination = paginer(
+        query,
+        [(Reservation.date_reservation, True), (ReservationItem.id_item, True)],
+        par_page=10,
+        table=None if search else 'reservation_items'
+    )
 
     return render_template(
         'liste_reservations.html',
-        reservations=pagination.items,
+        items=pagination.items,
         pagination=pagination,
         search=search
     )
 
+# -----------------------------
+# Export comptable des réservations (CSV en flux ou XLSX)
+# -----------------------------
+@reservation_bp.route('/export', methods=['GET'])
+def exporter_reservations():
+    return reponse_export(requete_export_reservations, COLONNES_RESERVATIONS, 'reservations')
+
+
+@reservation_bp.cli.command('export')
+@click.argument('chemin')
+@click.option('--search', default='', help="Filtre sur le nom, l'email ou le téléphone du client.")
+@click.option('--date-debut', default=None, help="AAAA-MM-JJ")
+@click.option('--date-fin', default=None, help="AAAA-MM-JJ")
+@click.option('--archive', is_flag=True, help="Inclut les réservations archivées.")
+def exporter_reservations_cli(chemin, search, date_debut, date_fin, archive):
+    exporter_vers_fichier(requete_export_reservations, COLONNES_RESERVATIONS, chemin, search, date_debut, date_fin, archive)
+    print(f"Réservations exportées dans {chemin}")
+
+# -----------------------------
+# Cohérence des totaux stockés (Reservation.total / nb_items)
+# -----------------------------
+@reservation_bp.cli.command('verifier-totaux')
+@click.option('--corriger', is_flag=True, help="Recalcule les réservations en écart.")
+@click.option('--limite', default=20, show_default=True, help="Nombre d'écarts affichés.")
+def verifier_totaux_cli(corriger, limite):
+    montant, nombre = totaux_calcules()
+    ecarts = (
+        db.session.query(Reservation.id_reservation, Reservation.total, montant, Reservation.nb_items, nombre)
+        .filter((Reservation.total != montant) | (Reservation.nb_items != nombre))
+        .order_by(Reservation.id_reservation)
+        .all()
+    )
+    for id_reservation, total, attendu, nb_items, nb_attendu in ecarts[:limite]:
+        print(f"#{id_reservation} : total {total} (attendu {attendu}), lignes {nb_items} (attendu {nb_attendu})")
+    if len(ecarts) > limite:
+        print(f"... et {len(ecarts) - limite} autre(s)")
+    print(f"{len(ecarts)} réservation(s) en écart")
+
+    if corriger and ecarts:
+        corrigees = recalculer_totaux(db.session.connection(), [e[0] for e in ecarts])
+        db.session.commit()
+        print(f"{corrigees} réservation(s) recalculée(s)")
+
+# -----------------------------
+# Archivage des réservations anciennes (mois entiers)
+# -----------------------------
+@reservation_bp.cli.command('archiver')
+@click.option('--mois', type=int, default=None, help="Mois conservés dans les tables actives (défaut : ARCHIVE_MOIS_ACTIFS, 12).")
+@click.option('--lot', default=TAILLE_LOT, show_default=True, help="Réservations déplacées par transaction.")
+@click.option('--simulation', is_flag=True, help="Affiche le nombre de réservations concernées sans rien déplacer.")
+def archiver_cli(mois, lot, simulation):
+    avant = seuil_archivage(mois)
+    if simulation:
+        print(f"{a_archiver(avant)} réservation(s) antérieure(s) au {avant:%d/%m/%Y} à archiver")
+        return
+    reservations, lignes = archiver(avant, lot)
+    print(f"{reservations} réservation(s) et {lignes} ligne(s) archivées (avant le {avant:%d/%m/%Y})")
+
 # -----------------------------
 # Ajouter une réservation
 # -----------------------------
@@ -74,9 +143,33 @@ def ajouter_reservation():
             nombre_personnes = int(request.form.get('nombre_personnes', 1))
         except ValueError:
             nombre_personnes = 1
+        if nombre_personnes < 1:
+            db.session.rollback()
+            flash("Le nombre de personnes doit être au moins 1.", "danger")
+            return redirect(url_for('reservation.ajouter_reservation'))
 
         date_reservation = request.form.get('date_reservation') or datetime.now().date()
         heure_reservation = request.form.get('heure_reservation') or datetime.now().time()
+        if isinstance(date_reservation, str):
+            date_reservation = datetime.strptime(date_reservation, "%Y-%m-%d").date()
+        if isinstance(heure_reservation, str):
+            heure_reservation = datetime.strptime(heure_reservation[:5], "%H:%M").time()
+
+        try:
+            statut = StatutReservation(request.form.get('status') or StatutReservation.EN_ATTENTE)
+        except ValueError:
+            db.session.rollback()
+            flash("Statut de réservation invalide.", "danger")
+            return redirect(url_for('reservation.ajouter_reservation'))
+
+        # Une réservation saisie déjà annulée n'occupe pas de place
+        id_creneau = None
+        if statut != StatutReservation.ANNULEE:
+            id_creneau, erreur = reserver_creneau(date_reservation, heure_reservation, nombre_personnes, hors_horaires=True)
+            if erreur:
+                db.session.rollback()
+                flash(erreur, "warning")
+                return redirect(url_for('reservation.ajouter_reservation'))
 
         reservation = Reservation(
             id_client=client.id_client,
@@ -84,8 +177,9 @@ def ajouter_reservation():
             heure_reservation=heure_reservation,
             nombre_personnes=nombre_personnes,
             message=request.form.get('message'),
-            status=request.form.get('status', 'En attente')
+            id_creneau=id_creneau
         )
+        reservation.changer_statut(statut)
         db.session.add(reservation)
         try:
             db.session.commit()
@@ -114,18 +208,63 @@ def modifier_reservation(id):
                 return redirect(url_for('reservation.modifier_reservation', id=id))
             reservation.id_client = client.id_client
 
+        ancien_creneau = (reservation.id_creneau, reservation.nombre_personnes,
+                          reservation.date_reservation, reservation.heure_reservation)
+
         try:
             reservation.nombre_personnes = int(request.form.get('nombre_personnes', 1))
         except ValueError:
             reservation.nombre_personnes = 1
-
-        reservation.date_reservation = request.form.get('date_reservation') or reservation.date_reservation
-        reservation.heure_reservation = request.form.get('heure_reservation') or reservation.heure_reservation
+        if reservation.nombre_personnes < 1:
+            db.session.rollback()
+            flash("Le nombre de personnes doit être au moins 1.", "danger")
+            return redirect(url_for('reservation.modifier_reservation', id=id))
+
+        date_form = request.form.get('date_reservation')
+        heure_form = request.form.get('heure_reservation')
+        if date_form:
+            reservation.date_reservation = datetime.strptime(date_form, "%Y-%m-%d").date()
+        if heure_form:
+            reservation.heure_reservation = datetime.strptime(heure_form[:5], "%H:%M").time()
         reservation.message = request.form.get('message', reservation.message)
-        reservation.status = request.form.get('status') or reservation.status
+        ancien_status = reservation.status
+        try:
+            # TransitionInvalide (ex. Servi -> En attente) ou valeur inconnue : ValueError
+            reservation.changer_statut(request.form.get('status') or reservation.status)
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e) if isinstance(e, TransitionInvalide) else "Statut de réservation invalide.", "danger")
+            return redirect(url_for('reservation.modifier_reservation', id=id))
+
+        # Capacité : on rend l'ancien créneau (annulation ou changement), puis toute réservation
+        # active sans créneau en reprend un : réouverture d'une annulée, passage en heures de service
+        id_creneau, nb_personnes = ancien_creneau[:2]
+        active = reservation.status != StatutReservation.ANNULEE
+        modifiee = ancien_creneau[1:] != (reservation.nombre_personnes, reservation.date_reservation,
+                                          reservation.heure_reservation)
+        if id_creneau and (not active or modifiee):
+            liberer_creneau(id_creneau, nb_personnes)
+            reservation.id_creneau = None
+        if active and reservation.id_creneau is None:
+            nouveau_creneau, erreur = reserver_creneau(
+                reservation.date_reservation, reservation.heure_reservation, reservation.nombre_personnes,
+                hors_horaires=True
+            )
+            if erreur:
+                db.session.rollback()
+                flash(erreur, "warning")
+                return redirect(url_for('reservation.modifier_reservation', id=id))
+            reservation.id_creneau = nouveau_creneau
+        promus = []
+        if id_creneau and (reservation.id_creneau != id_creneau or reservation.nombre_personnes < nb_personnes):
+            promus = files_attente.promouvoir(id_creneau)
+        messages = messages_promotion(promus)
 
         try:
             db.session.commit()
+            envoyer_emails_async(messages)
+            if reservation.status != ancien_status:
+                bus_evenements.publier('status-changed', {'id': reservation.id_reservation, 'status': reservation.status})
             flash("Réservation modifiée avec succès !", "success")
         except IntegrityError:
             db.session.rollback()
@@ -141,8 +280,14 @@ def modifier_reservation(id):
 @reservation_bp.route('/supprimer/<int:id>', methods=['POST'])
 def supprimer_reservation(id):
     reservation = Reservation.query.get_or_404(id)
+    id_creneau = reservation.id_creneau
+    liberer_creneau(id_creneau, reservation.nombre_personnes)
     db.session.delete(reservation)
+    db.session.flush()
+    messages = messages_promotion(files_attente.promouvoir(id_creneau)) if id_creneau else []
     db.session.commit()
+    envoyer_emails_async(messages)
+    bus_evenements.publier('status-changed', {'id': id, 'status': None, 'supprimee': True})
     flash("Réservation supprimée avec succès !", "success")
     return redirect(url_for('reservation.liste_reservations'))
 
@@ -151,35 +296,25 @@ def supprimer_reservation(id):
 # -----------------------------
 @reservation_bp.route('/plats_reserves', methods=['GET'])
 def liste_plats_reserves():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-
-    query = ReservationItem.query.join(Reservation).join(Client).join(Plat)
     search = request.args.get('search', '').strip()
-    if search:
-        query = query.filter(
-            (Client.nom.ilike(f"%{search}%")) |
-            (Client.email.ilike(f"%{search}%")) |
-            (Client.telephone.ilike(f"%{search}%")) |
-            (Plat.nom.ilike(f"%{search}%"))
-        )
-
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    items = pagination.items
-
-    # Totaux
-    total_qte = query.with_entities(func.sum(ReservationItem.quantite)).scalar() or 0
-    clients = query.with_entities(func.count(func.distinct(Client.id_client))).scalar() or 0
-    montant_total = query.with_entities(func.sum(ReservationItem.quantite * Plat.prix)).scalar() or 0.0
-    montant_total = float(montant_total)
+    query = requete_items(search)
+
+    # Totaux en une requête d'agrégat, puis la page
+    totaux = totaux_lignes(query)
+    pagination = paginer(
+        query,
+        [(Reservation.date_reservation, True), (ReservationItem.id_item, True)],
+        par_page=10,
+        total=totaux['lignes']
+    )
 
     return render_template(
         'reservation_items/liste_plats_reserves.html',
-        items=items,
+        items=pagination.items,
         pagination=pagination,
-        total_qte=total_qte,
-        clients=clients,
-        montant_total=montant_total,
+        total_qte=totaux['total_qte'],
+        clients=totaux['clients'],
+        montant_total=totaux['montant_total'],
         search=search
     )
 
@@ -211,14 +346,12 @@ def telecharger_ticket(reservation_id):
 
     # Liste des plats réservés + calcul total
     y = 660
-    montant_total = 0
     if hasattr(reservation, 'items') and reservation.items:
         for item in reservation.items:
             plat_nom = item.plat.nom if item.plat else "Plat inconnu"
-            quantite = float(item.quantite or 0)
-            prix = float(item.plat.prix if item.plat else 0.0)
-            total = quantite * prix
-            montant_total += total
+            quantite = item.quantite
+            prix = float(item.prix_unitaire)
+            total = float(item.total)
             c.drawString(50, y, f"{plat_nom} x {quantite} - {prix:.2f}$ = {total:.2f}$")
             y -= 20
     else:
@@ -227,7 +360,7 @@ def telecharger_ticket(reservation_id):
 
     # Montant total
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y - 10, f"Montant total : {montant_total:.2f} $")
+    c.drawString(50, y - 10, f"Montant total : {float(reservation.total):.2f} $")
 
     # QR code
     qr = qrcode.QRCode(box_size=3)
@@ -54,7 +54,7 @@ class Reservation(db.Model):
     heure_reservation = db.Column(db.Time, nullable=False)
     nombre_personnes = db.Column(db.Integer, default=1)
     message = db.Column(db.Text)
-    status = db.Column(db.String(20), default='en attente')
+    status = db.Column(db.String(20), default='En attente')  # valeurs : models.StatutReservation
 
 
 class ReservationItem(db.Model):
@@ -0,0 +1,32 @@
+# telephone.py
+# Normalisation des numéros de téléphone au format E.164 (+<indicatif><numéro>)
+# pour des recherches exactes et indexées, quel que soit le format saisi.
+import re
+
+from flask import current_app, has_app_context
+
+INDICATIF_PAR_DEFAUT = '243'
+
+
+def normaliser_telephone(telephone, indicatif=None):
+    if not telephone:
+        return None
+    if indicatif is None:
+        indicatif = (current_app.config.get('INDICATIF_PAYS', INDICATIF_PAR_DEFAUT)
+                     if has_app_context() else INDICATIF_PAR_DEFAUT)
+
+    brut = telephone.strip()
+    chiffres = re.sub(r'\D', '', brut)
+    if brut.startswith('+'):
+        pass
+    elif chiffres.startswith('00'):
+        chiffres = chiffres[2:]
+    elif chiffres.startswith('0'):
+        # Numéro national avec préfixe 0 : 0897653728 -> +243897653728
+        chiffres = indicatif + chiffres[1:]
+    elif len(chiffres) <= 9:
+        chiffres = indicatif + chiffres
+
+    if not 6 <= len(chiffres) <= 15:
+        return None
+    return f"+{chiffres}"
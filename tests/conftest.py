@@ -0,0 +1,73 @@
+# conftest.py
+# Application sur une base SQLite temporaire (DATABASE_URL lu à l'import de app.py)
+import os
+import sys
+import tempfile
+from datetime import date, time
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+_fd, CHEMIN_BASE = tempfile.mkstemp(suffix='.db')
+os.close(_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{CHEMIN_BASE}'
+
+from app import app as application  # noqa: E402
+from models import db, Categorie, Client, Plat, Reservation, ReservationItem, StatutReservation  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    application.config['TESTING'] = True
+    with application.app_context():
+        db.drop_all()
+        db.create_all()
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def donnees(app):
+    # Un client, deux plats et cinq réservations du jour (QR0 à QR4) avec deux lignes chacune
+    with app.app_context():
+        categorie = Categorie(nom='Plats')
+        db.session.add(categorie)
+        db.session.flush()
+        poulet = Plat(nom='Poulet', prix=10, categorie_id=categorie.categorie_id)
+        poisson = Plat(nom='Poisson', prix=7.5, categorie_id=categorie.categorie_id)
+        client = Client(nom='Jean', prenom='D', email='jean@exemple.com',
+                        telephone='0812345678', mot_de_passe='x')
+        db.session.add_all([poulet, poisson, client])
+        db.session.flush()
+
+        ids = []
+        for i in range(5):
+            reservation = Reservation(
+                id_client=client.id_client, date_reservation=date.today(),
+                heure_reservation=time(12, 0), qrcode_data=f'QR{i}',
+                status=StatutReservation.EN_ATTENTE
+            )
+            db.session.add(reservation)
+            db.session.flush()
+            db.session.add_all([
+                ReservationItem(id_reservation=reservation.id_reservation, plat_id=poulet.id_plat,
+                                quantite=2, prix_unitaire=10),
+                ReservationItem(id_reservation=reservation.id_reservation, plat_id=poisson.id_plat,
+                                quantite=1, prix_unitaire=7.5),
+            ])
+            ids.append(reservation.id_reservation)
+        db.session.commit()
+        return {'id_client': client.id_client, 'reservations': ids}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    os.remove(CHEMIN_BASE)
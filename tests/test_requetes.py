@@ -0,0 +1,71 @@
+# test_requetes.py
+# Nombre de requêtes SQL par page : fixe, quel que soit le nombre de réservations (pas de N+1)
+from contextlib import contextmanager
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Reservation, ReservationItem, StatutReservation
+
+# (page, plafond, texte attendu) : le plafond est le nombre mesuré, toute requête en plus fait
+# échouer le test ; le texte attendu prouve que les lignes sont bien rendues (page non vide)
+PAGES = [
+    ('/clients/mes_commandes', 3, 'Poulet (x2)'),
+    ('/reservation-public/commandes', 3, 'Poulet (x2)'),
+    ('/dashboard/', 16, 'jean@exemple.com'),
+    ('/reservation/', 2, 'Poulet'),
+    ('/reservation-public/liste_reservations', 3, 'Poulet'),
+]
+
+
+@contextmanager
+def compter_requetes(app):
+    requetes = []
+
+    def enregistrer(conn, cursor, statement, parameters, context, executemany):
+        requetes.append(statement)
+
+    with app.app_context():
+        moteur = db.engine
+    event.listen(moteur, 'before_cursor_execute', enregistrer)
+    try:
+        yield requetes
+    finally:
+        event.remove(moteur, 'before_cursor_execute', enregistrer)
+
+
+def ajouter_reservations(app, id_client, nombre):
+    with app.app_context():
+        plat_id = db.session.query(ReservationItem.plat_id).limit(1).scalar()
+        for _ in range(nombre):
+            reservation = Reservation(
+                id_client=id_client, date_reservation=date.today(), heure_reservation=time(13, 0),
+                status=StatutReservation.CONFIRMEE
+            )
+            db.session.add(reservation)
+            db.session.flush()
+            db.session.add(ReservationItem(id_reservation=reservation.id_reservation, plat_id=plat_id,
+                                           quantite=1, prix_unitaire=10))
+        db.session.commit()
+
+
+def requetes_page(app, client, url, attendu):
+    with compter_requetes(app) as requetes:
+        reponse = client.get(url)
+    assert reponse.status_code == 200
+    assert attendu in reponse.get_data(as_text=True), url
+    return requetes
+
+
+@pytest.mark.parametrize('url,maximum,attendu', PAGES)
+def test_nombre_de_requetes(app, client, donnees, url, maximum, attendu):
+    with client.session_transaction() as session:
+        session['client_id'] = donnees['id_client']
+
+    requetes = requetes_page(app, client, url, attendu)
+    assert len(requetes) <= maximum, '\n'.join(requetes)
+
+    # Trois fois plus de réservations : pas une requête de plus (identité déjà en cache de session)
+    ajouter_reservations(app, donnees['id_client'], 10)
+    assert len(requetes_page(app, client, url, attendu)) <= len(requetes)
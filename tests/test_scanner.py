@@ -0,0 +1,57 @@
+# test_scanner.py
+# Service des tickets : un seul scan gagnant, lots bornés, corps invalides refusés
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from models import db, Reservation, StatutReservation
+from routes.reservation_public import MAX_TICKETS_LOT
+
+NB_SCANNERS = 8
+
+
+def test_meme_ticket_servi_une_seule_fois(app, donnees):
+    reservation_id = donnees['reservations'][0]
+    depart = Barrier(NB_SCANNERS)
+
+    def scanner(_):
+        # Un client de test par thread : les scans partent ensemble
+        client = app.test_client()
+        depart.wait()
+        return client.post(f'/reservation-public/scanner/serve/{reservation_id}').get_json()
+
+    with ThreadPoolExecutor(NB_SCANNERS) as pool:
+        reponses = list(pool.map(scanner, range(NB_SCANNERS)))
+
+    assert sum(r['success'] for r in reponses) == 1
+    assert all(r['message'] == "Ce client a déjà été servi." for r in reponses if not r['success'])
+    with app.app_context():
+        assert db.session.get(Reservation, reservation_id).status == StatutReservation.SERVI
+
+
+def test_lot_servi_puis_refuse(client, donnees):
+    ids = donnees['reservations'][:3]
+    premier = client.post('/reservation-public/scanner/serve', json={'reservation_ids': ids}).get_json()
+    assert premier['servis'] == sorted(ids)
+
+    second = client.post('/reservation-public/scanner/serve', json={'reservation_ids': ids + [999999]}).get_json()
+    assert second['success'] is False
+    assert second['deja_servis'] == sorted(ids)
+    assert second['introuvables'] == [999999]
+
+
+def test_lot_trop_grand(client, donnees):
+    ids = list(range(1, MAX_TICKETS_LOT + 2))
+    reponse = client.post('/reservation-public/scanner/serve', json={'reservation_ids': ids})
+    assert reponse.status_code == 400
+
+    events = [{'reservation_id': i} for i in ids]
+    reponse = client.post('/reservation-public/scanner/sync', json={'events': events})
+    assert reponse.status_code == 400
+
+
+def test_corps_non_json(client, donnees):
+    for url in ('/reservation-public/scanner/serve', '/reservation-public/scanner/sync'):
+        reponse = client.post(url, data='pas du json', content_type='application/json')
+        assert reponse.status_code == 400
+        reponse = client.post(url, json=[1, 2])
+        assert reponse.status_code == 400